@@ -0,0 +1,45 @@
+"""Índices de cobertura para as consultas mais frequentes
+
+Avaliações por filme (ranking, estatísticas) e por usuário (recomendações,
+lote pré-calculado, ETL), gêneros por gênero em movie_genre e tags por filme
+e por (usuário, filme, tag). Bancos criados depois desta revisão já recebem os
+índices por create_all, por isso a criação ignora índices existentes.
+
+Revision ID: 3f1a9c2d7b10
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Identificadores da revisão, usados pelo Alembic
+revision: str = '3f1a9c2d7b10'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nome, tabela, colunas)
+INDEXES = [
+    ("ix_ratings_movie_rating", "ratings", ["movie_id", "rating"]),
+    ("ix_ratings_user_movie", "ratings", ["user_id", "movie_id"]),
+    ("ix_movie_genre_genre_movie", "movie_genre", ["genre_id", "movie_id"]),
+    ("ix_tags_movie_id", "tags", ["movie_id"]),
+    ("ix_tags_user_movie_tag", "tags", ["user_id", "movie_id", "tag"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+    # Estatísticas para o planejador escolher os novos índices
+    op.execute(sa.text("ANALYZE"))
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
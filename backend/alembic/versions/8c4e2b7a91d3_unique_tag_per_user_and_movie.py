@@ -0,0 +1,48 @@
+"""Tag única por (usuário, filme, tag)
+
+O índice ix_tags_user_movie_tag passa a ser UNIQUE para garantir no banco a
+deduplicação feita em memória pelo ETL (INSERT ... ON CONFLICT DO NOTHING).
+Tags repetidas já gravadas são removidas antes, mantendo a de menor id.
+
+Revision ID: 8c4e2b7a91d3
+Revises: 3f1a9c2d7b10
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Identificadores da revisão, usados pelo Alembic
+revision: str = '8c4e2b7a91d3'
+down_revision: Union[str, None] = '3f1a9c2d7b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEX = "ix_tags_user_movie_tag"
+COLUMNS = ["user_id", "movie_id", "tag"]
+
+
+def _index_is_unique() -> bool:
+    indexes = sa.inspect(op.get_bind()).get_indexes("tags")
+    return any(index["name"] == INDEX and index["unique"] for index in indexes)
+
+
+def upgrade() -> None:
+    # Bancos criados depois desta revisão já recebem o índice único por create_all
+    if _index_is_unique():
+        return
+
+    op.execute(sa.text(
+        "DELETE FROM tags WHERE id NOT IN "
+        "(SELECT MIN(id) FROM tags GROUP BY user_id, movie_id, tag)"
+    ))
+    op.drop_index(INDEX, table_name="tags", if_exists=True)
+    op.create_index(INDEX, "tags", COLUMNS, unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(INDEX, table_name="tags", if_exists=True)
+    op.create_index(INDEX, "tags", COLUMNS)
@@ -0,0 +1,40 @@
+"""Marcas d'água do ETL por arquivo
+
+Tabela etl_file_state com o deslocamento em bytes e o SHA-256 do trecho já
+importado de cada CSV do MovieLens, usada para importar só o que foi
+acrescentado e retomar uma importação interrompida. Bancos criados depois
+desta revisão já recebem a tabela por create_all.
+
+Revision ID: b7d05e3f6a21
+Revises: 8c4e2b7a91d3
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Identificadores da revisão, usados pelo Alembic
+revision: str = 'b7d05e3f6a21'
+down_revision: Union[str, None] = '8c4e2b7a91d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("etl_file_state"):
+        return
+
+    op.create_table(
+        "etl_file_state",
+        sa.Column("file_name", sa.String(), primary_key=True),
+        sa.Column("byte_offset", sa.BigInteger(), nullable=False),
+        sa.Column("checksum", sa.String(), nullable=False),
+        sa.Column("updated_at", sa.BigInteger(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("etl_file_state")
@@ -0,0 +1,78 @@
+"""Agregados e máscara de gêneros em movies, rankings e recomendações em lote
+
+Colunas average_rating, rating_count e genre_mask em movies e as tabelas
+movie_rankings e user_recommendations, que antes só existiam por create_all
+(ou por ALTER TABLE no ETL). A máscara de gêneros é preenchida a partir de
+movie_genre; os agregados e rankings são recalculados pelo ETL na
+inicialização. Bancos que já têm as colunas e tabelas não são alterados.
+
+Revision ID: d2a8f41c6e57
+Revises: b7d05e3f6a21
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Identificadores da revisão, usados pelo Alembic
+revision: str = 'd2a8f41c6e57'
+down_revision: Union[str, None] = 'b7d05e3f6a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (nome, tipo) das colunas acrescentadas a movies, todas NOT NULL DEFAULT 0
+MOVIE_COLUMNS = [
+    ("average_rating", sa.Float()),
+    ("rating_count", sa.Integer()),
+    ("genre_mask", sa.Integer()),
+]
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    existing = {column["name"] for column in inspector.get_columns("movies")}
+    missing = [(name, type_) for name, type_ in MOVIE_COLUMNS if name not in existing]
+    for name, type_ in missing:
+        op.add_column("movies", sa.Column(name, type_, nullable=False, server_default="0"))
+
+    # Bit genre_id - 1 de cada gênero do filme (a soma de potências distintas de 2
+    # equivale ao OU dos bits), como app.services.catalog.update_genre_masks
+    if "genre_mask" in {name for name, _ in missing}:
+        op.execute(sa.text(
+            "UPDATE movies SET genre_mask = COALESCE("
+            "(SELECT SUM(1 << (mg.genre_id - 1)) FROM movie_genre mg WHERE mg.movie_id = movies.id), 0)"
+        ))
+
+    if not inspector.has_table("movie_rankings"):
+        op.create_table(
+            "movie_rankings",
+            sa.Column("movie_id", sa.Integer(), sa.ForeignKey("movies.id"), primary_key=True),
+            sa.Column("rating_mean", sa.Float(), nullable=False),
+            sa.Column("rating_count", sa.Integer(), nullable=False),
+            sa.Column("bayesian_score", sa.Float(), nullable=False),
+        )
+        op.create_index("ix_movie_rankings_score", "movie_rankings", ["bayesian_score", "movie_id"])
+
+    if not inspector.has_table("user_recommendations"):
+        op.create_table(
+            "user_recommendations",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("movie_ids", sa.JSON(), nullable=False),
+            sa.Column("last_rating_id", sa.Integer(), nullable=False),
+            sa.Column("model_version", sa.String(), nullable=False),
+            sa.Column("created_at", sa.BigInteger(), nullable=False),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("user_recommendations")
+    op.drop_index("ix_movie_rankings_score", table_name="movie_rankings", if_exists=True)
+    op.drop_table("movie_rankings")
+    # DROP COLUMN nativo (SQLite 3.35+): recriar movies em lote apagaria os
+    # gatilhos do índice de busca textual
+    for name, _ in reversed(MOVIE_COLUMNS):
+        op.drop_column("movies", name)
@@ -0,0 +1,34 @@
+"""Contagem de avaliações do usuário nas recomendações pré-calculadas
+
+Coluna rating_count em user_recommendations, com o número de avaliações do
+usuário consideradas pelo lote; a lista é ignorada quando a contagem atual é
+outra (avaliações removidas ou acrescentadas). Linhas antigas ficam com NULL
+e são ignoradas até o próximo scripts/precompute_recommendations.py.
+
+Revision ID: e5c1b9d37f42
+Revises: d2a8f41c6e57
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# Identificadores da revisão, usados pelo Alembic
+revision: str = 'e5c1b9d37f42'
+down_revision: Union[str, None] = 'd2a8f41c6e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Bancos criados depois desta revisão já recebem a coluna por create_all
+    columns = {column["name"] for column in sa.inspect(op.get_bind()).get_columns("user_recommendations")}
+    if "rating_count" not in columns:
+        op.add_column("user_recommendations", sa.Column("rating_count", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("user_recommendations", "rating_count")
@@ -1,15 +1,17 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
 from app.core import security
 from app.core.config import settings
-from app.database.session import SessionLocal
+from app.database.session import AsyncSessionLocal, SessionLocal
+from app.services.user_cache import get_cached_user, store_user
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
@@ -20,9 +22,17 @@ def get_db() -> Generator:
     finally:
         db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> models.User:
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> schemas.User:
+    """
+    Usuário do token. Usuários ativos ficam em cache por alguns segundos
+    (app/services/user_cache.py), evitando a consulta a cada requisição.
+    """
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=["HS256"]
@@ -33,21 +43,27 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Não foi possível validar as credenciais",
         )
-    user = db.query(models.User).filter(models.User.id == token_data.sub).first()
-    if not user:
+    user = get_cached_user(token_data.sub) if token_data.sub is not None else None
+    if user is not None:
+        return user
+
+    db_user = await db.scalar(select(models.User).where(models.User.id == token_data.sub))
+    if not db_user:
         raise HTTPException(status_code=404, detail="Usuário não encontrado")
+    user = schemas.User.model_validate(db_user)
+    store_user(user)
     return user
 
-def get_current_active_user(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+async def get_current_active_user(
+    current_user: schemas.User = Depends(get_current_user),
+) -> schemas.User:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Usuário inativo")
     return current_user
 
-def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+async def get_current_active_superuser(
+    current_user: schemas.User = Depends(get_current_user),
+) -> schemas.User:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=400, detail="O usuário não tem privilégios de administrador"
@@ -70,7 +70,7 @@ def register_user(
 
 @router.get("/me", response_model=schemas.User)
 def read_users_me(
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: schemas.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Obter informações do usuário atual
@@ -1,49 +1,62 @@
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app import models, schemas
 from app.api import deps
+from app.utils.pagination import after_cursor, encode_cursor
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[schemas.Movie])
-def read_favorites(
+async def read_favorites(
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: schemas.User = Depends(deps.get_current_active_user),
+    response: Response,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None
 ) -> Any:
     """
-    Recupera todos os filmes favoritos do usuário atual.
+    Recupera todos os filmes favoritos do usuário atual, na ordem em que foram
+    favoritados. Quando há mais páginas, o cabeçalho X-Next-Cursor traz o
+    cursor a enviar em `cursor` para continuar a partir do último filme.
     """
-    favorites = (
-        db.query(models.Movie)
+    statement = (
+        select(models.Movie, models.Favorite.id)
         .join(models.Favorite)
-        .filter(models.Favorite.user_id == current_user.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
+        .where(models.Favorite.user_id == current_user.id)
+        .options(selectinload(models.Movie.genres))
     )
-    return favorites
+    if cursor:
+        statement = after_cursor(statement, [models.Favorite.id], cursor)
+    else:
+        statement = statement.offset(skip)
+    rows = (await db.execute(statement.order_by(models.Favorite.id).limit(limit))).all()
+
+    if len(rows) == limit:
+        response.headers["X-Next-Cursor"] = encode_cursor([rows[-1][1]])
+    return [row[0] for row in rows]
 
 
 @router.post("/{movie_id}", response_model=schemas.Favorite)
-def add_favorite(
+async def add_favorite(
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: schemas.User = Depends(deps.get_current_active_user),
     movie_id: int
 ) -> Any:
     """
     Adiciona um filme aos favoritos do usuário.
     """
     # Verificar se o filme existe
-    movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+    movie = await db.get(models.Movie, movie_id)
     if not movie:
         raise HTTPException(
             status_code=404,
@@ -58,11 +71,11 @@ def add_favorite(
 
     try:
         db.add(favorite)
-        db.commit()
-        db.refresh(favorite)
+        await db.commit()
+        await db.refresh(favorite)
         return favorite
     except IntegrityError:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=400,
             detail="Este filme já está nos favoritos"
@@ -70,19 +83,18 @@ def add_favorite(
 
 
 @router.delete("/{movie_id}", status_code=status.HTTP_204_NO_CONTENT)
-def remove_favorite(
+async def remove_favorite(
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: schemas.User = Depends(deps.get_current_active_user),
     movie_id: int
 ) -> None:
     """
     Remove um filme dos favoritos do usuário.
     """
-    favorite = (
-        db.query(models.Favorite)
-        .filter(models.Favorite.user_id == current_user.id, models.Favorite.movie_id == movie_id)
-        .first()
+    favorite = await db.scalar(
+        select(models.Favorite)
+        .where(models.Favorite.user_id == current_user.id, models.Favorite.movie_id == movie_id)
     )
     if not favorite:
         raise HTTPException(
@@ -90,5 +102,5 @@ def remove_favorite(
             detail="Filme não encontrado nos favoritos"
         )
 
-    db.delete(favorite)
-    db.commit()
\ No newline at end of file
+    await db.delete(favorite)
+    await db.commit()
\ No newline at end of file
@@ -1,41 +1,74 @@
-from typing import Any, List, Optional
+from typing import Any, List, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import func, desc
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from sqlalchemy.sql import text
 
 from app import models, schemas
 from app.api import deps
+from app.core.config import settings
+from app.services.catalog import (
+    genre_filter, get_genre_index, get_title_index, refresh_genre_index, refresh_title_index,
+    suggest_titles, update_genre_masks
+)
+from app.services.ranking import popular_movies_select, rankings_version
+from app.services.movie_serialization import MOVIE_ROW_COLUMNS, encode_movie_list
+from app.services.response_cache import cache_body, cache_response, cached_response
+from app.services.search import filter_by_title
+from app.utils.pagination import after_cursor, encode_cursor, get_cached_total, store_total
 
 router = APIRouter()
 
+async def _count(db: AsyncSession, statement: Select) -> int:
+    """Total de linhas de uma consulta (sem ordenação nem paginação)."""
+    return await db.scalar(select(func.count()).select_from(statement.order_by(None).subquery())) or 0
+
 @router.get("/search", response_model=schemas.MovieList)
-def search_movies(
+async def search_movies(
     *,
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
     title: Optional[str] = None,
     year: Optional[int] = None,
     genre: Optional[str] = None,
     genres: Optional[List[str]] = Query(None),
+    genre_match: Literal["all", "any"] = "all",
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
 ) -> Any:
     """
-    Buscar filmes por título, ano e/ou gênero(s).
+    Buscar filmes por título, ano e/ou gênero(s). Com vários gêneros,
+    `genre_match` escolhe entre filmes com todos ("all") ou algum ("any") deles.
+
+    A paginação por `cursor` (o `next_cursor` da página anterior) continua do
+    último item recebido pelas colunas de ordenação, com custo constante em
+    qualquer página; `skip` continua aceito. O total é calculado uma vez por
+    filtro e versão do catálogo.
     """
-    query = db.query(models.Movie).options(joinedload(models.Movie.genres))
+    # Resultados filtrados por gênero se repetem muito entre usuários: cache por versão dos dados
+    use_cache = bool(genre or genres)
+    if use_cache and (cached := cached_response(request)) is not None:
+        return cached
+
+    statement = select(models.Movie)
+    order_by = [models.Movie.title]
 
     if title:
-        query = query.filter(models.Movie.title.ilike(f"%{title}%"))
+        # Índice de texto (FTS5) com ordenação por relevância
+        statement, order_by = filter_by_title(statement, title)
 
     if year:
-        query = query.filter(models.Movie.year == year)
+        statement = statement.where(models.Movie.year == year)
 
     # Para manter compatibilidade com versões anteriores, mantemos o suporte para um único gênero
     if genre and not genres:
         genres = [genre]
 
+    genre_index = await db.run_sync(get_genre_index)
     if genres:
         # Remover duplicatas dos gêneros
         unique_genres = list(set(genres))
@@ -43,90 +76,169 @@ def search_movies(
         # Log para debug
         print(f"Buscando por {len(unique_genres)} gêneros únicos: {unique_genres}")
 
-        for genre_name in unique_genres:
-            genre_obj = db.query(models.Genre).filter(models.Genre.name == genre_name).first()
-            if genre_obj:
-                query = query.filter(models.Movie.genres.any(models.Genre.id == genre_obj.id))
-            else:
-                # Se um dos gêneros não existe, continuamos com os outros
-                print(f"Gênero não encontrado: {genre_name}")
-
-    total = query.count()
-    movies = query.order_by(models.Movie.title).offset(skip).limit(limit).all()
-
-    return {"items": movies, "total": total}
+        # Nomes resolvidos pelo índice de gêneros em memória; todos os gêneros viram
+        # um único predicado sobre a máscara de gêneros do filme.
+        # Se um dos gêneros não existe, continuamos com os outros
+        unknown_genres = [name for name in unique_genres if name not in genre_index.genre_ids_by_name]
+        if unknown_genres:
+            print(f"Gêneros não encontrados: {unknown_genres}")
+
+        genre_predicate = genre_filter(genre_index, unique_genres, match_all=genre_match == "all")
+        if genre_predicate is not None:
+            statement = statement.where(genre_predicate)
+
+    total = None
+    if include_total:
+        filter_key = ("search", title, year, tuple(sorted(set(genres or []))), genre_match, genre_index.version)
+        total = get_cached_total(filter_key)
+        if total is None:
+            total = await _count(db, statement)
+            store_total(filter_key, total)
+
+    # Desempate por id para que a ordem (e o cursor) seja total. Gêneros carregados
+    # em uma segunda consulta só para a página retornada (joinedload com LIMIT
+    # materializa a junção movie_genre inteira)
+    order_by = [*order_by, models.Movie.id]
+    fast_path = settings.MOVIE_LIST_FAST_PATH
+    if fast_path:
+        # Só as colunas da resposta, sem objetos ORM
+        statement = statement.with_only_columns(*MOVIE_ROW_COLUMNS, *order_by)
+        sort_start = len(MOVIE_ROW_COLUMNS)
+    else:
+        statement = statement.add_columns(*order_by).options(selectinload(models.Movie.genres))
+        sort_start = 1
+    statement = statement.order_by(*order_by)
+    if cursor:
+        statement = after_cursor(statement, order_by, cursor)
+    else:
+        statement = statement.offset(skip)
+    rows = (await db.execute(statement.limit(limit))).all()
+    next_cursor = encode_cursor(rows[-1][sort_start:]) if len(rows) == limit else None
+
+    if fast_path:
+        body = encode_movie_list(genre_index, rows, total, next_cursor)
+        return cache_body(request, body) if use_cache else Response(content=body, media_type="application/json")
+
+    result = {
+        "items": [row[0] for row in rows],
+        "total": total,
+        "next_cursor": next_cursor,
+    }
+    return cache_response(request, schemas.MovieList, result) if use_cache else result
+
+@router.get("/suggest", response_model=List[schemas.MovieSuggestion])
+async def suggest_movies(
+    *,
+    db: AsyncSession = Depends(deps.get_async_db),
+    q: str = Query(..., min_length=1),
+    limit: int = Query(10, ge=1, le=50),
+) -> Any:
+    """
+    Sugestões de títulos para autocompletar: filmes cujo título começa com `q`
+    (também "the matrix" para "Matrix, The"), os mais avaliados primeiro.
+    Respondido pelo índice de títulos em memória.
+    """
+    return suggest_titles(await db.run_sync(get_title_index), q, limit)
 
 @router.get("/top-rated", response_model=schemas.MovieList)
-def get_top_rated_movies(
+async def get_top_rated_movies(
     *,
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
+    include_total: bool = True,
 ) -> Any:
     """
-    Retorna os filmes mais bem avaliados com suporte à paginação.
+    Retorna os filmes mais bem avaliados com suporte à paginação
+    (por `skip` ou pelo `next_cursor` da página anterior).
+    A ordenação usa a pontuação bayesiana mantida na tabela movie_rankings,
+    exigindo um mínimo de avaliações por filme.
     """
-    # Subconsulta para calcular a média de avaliações por filme
-    subquery = (
-        db.query(
-            models.Rating.movie_id,
-            func.avg(models.Rating.rating).label("avg_rating"),
-            func.count(models.Rating.id).label("rating_count")
-        )
-        .group_by(models.Rating.movie_id)
-        .subquery()
-    )
-
-    # Consulta para obter o total de filmes que atendem aos critérios
-    count_query = (
-        db.query(func.count())
-        .select_from(models.Movie)
-        .join(subquery, models.Movie.id == subquery.c.movie_id)
-        .filter(subquery.c.rating_count >= 5)
-    )
-    total = count_query.scalar() or 0
-
-    # Consulta principal para obter os filmes mais bem avaliados
-    # com um mínimo de 5 avaliações
-    query = (
-        db.query(models.Movie)
-        .join(subquery, models.Movie.id == subquery.c.movie_id)
-        .filter(subquery.c.rating_count >= 5)
-        .options(joinedload(models.Movie.genres))
-        .order_by(desc(subquery.c.avg_rating))
-        .offset(skip)
-        .limit(limit)
-    )
-
-    return {"items": query.all(), "total": total}
+    if (cached := cached_response(request)) is not None:
+        return cached
+
+    min_ratings = settings.RANKING_MIN_RATINGS
+
+    # Total de filmes que atendem ao mínimo de avaliações, por versão do ranking
+    total = None
+    if include_total:
+        version = rankings_version()
+        total_key = ("top-rated", min_ratings, version)
+        total = get_cached_total(total_key) if version is not None else None
+        if total is None:
+            total = await db.scalar(
+                select(func.count(models.MovieRanking.movie_id))
+                .where(models.MovieRanking.rating_count >= min_ratings)
+            ) or 0
+            if version is not None:
+                store_total(total_key, total)
+
+    # Consulta principal, lida em ordem pelo índice de pontuação
+    sort_columns = [models.MovieRanking.bayesian_score, models.MovieRanking.movie_id]
+    statement = popular_movies_select(min_ratings=min_ratings)
+    fast_path = settings.MOVIE_LIST_FAST_PATH
+    if fast_path:
+        # Só as colunas da resposta, sem objetos ORM
+        statement = statement.with_only_columns(*MOVIE_ROW_COLUMNS, *sort_columns)
+        sort_start = len(MOVIE_ROW_COLUMNS)
+    else:
+        statement = statement.add_columns(*sort_columns).options(selectinload(models.Movie.genres))
+        sort_start = 1
+    if cursor:
+        statement = after_cursor(statement, sort_columns, cursor, descending=True)
+    else:
+        statement = statement.offset(skip)
+    rows = (await db.execute(statement.limit(limit))).all()
+    next_cursor = encode_cursor(rows[-1][sort_start:]) if len(rows) == limit else None
+
+    if fast_path:
+        return cache_body(request, encode_movie_list(await db.run_sync(get_genre_index), rows, total, next_cursor))
+
+    return cache_response(request, schemas.MovieList, {
+        "items": [row[0] for row in rows],
+        "total": total,
+        "next_cursor": next_cursor,
+    })
 
 @router.get("/by-id/{movie_id}", response_model=schemas.Movie)
-def get_movie_by_id(
+async def get_movie_by_id(
     *,
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
     movie_id: int,
 ) -> Any:
     """
     Obtém detalhes de um filme pelo ID.
     """
-    movie = db.query(models.Movie).options(joinedload(models.Movie.genres)).filter(models.Movie.movie_id == movie_id).first()
+    if (cached := cached_response(request)) is not None:
+        return cached
+
+    movie = await db.scalar(
+        select(models.Movie).options(selectinload(models.Movie.genres)).where(models.Movie.movie_id == movie_id)
+    )
     if not movie:
         raise HTTPException(status_code=404, detail="Filme não encontrado")
-    return movie
+    return cache_response(request, schemas.Movie, movie)
 
 @router.get("/stats", response_model=schemas.MovieStats)
-def get_movie_stats(
+async def get_movie_stats(
     *,
-    db: Session = Depends(deps.get_db),
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
 ) -> Any:
     """
     Obtém estatísticas gerais sobre os filmes.
     """
+    if (cached := cached_response(request)) is not None:
+        return cached
+
     try:
         # Usar try/except para capturar possíveis erros
-        total_movies = db.query(func.count(models.Movie.id)).scalar() or 0
-        total_ratings = db.query(func.count(models.Rating.id)).scalar() or 0
-        avg_rating_result = db.query(func.avg(models.Rating.rating)).scalar()
+        total_movies = await db.scalar(select(func.count(models.Movie.id))) or 0
+        total_ratings = await db.scalar(select(func.count(models.Rating.id))) or 0
+        avg_rating_result = await db.scalar(select(func.avg(models.Rating.rating)))
         avg_rating = float(avg_rating_result) if avg_rating_result is not None else 0.0
 
         # Consulta de gêneros completamente reescrita para ser simples e eficiente
@@ -143,7 +255,7 @@ def get_movie_stats(
             LIMIT 10
             """
 
-            result = db.execute(text(genre_counts_query))
+            result = await db.execute(text(genre_counts_query))
             genre_counts = [(row[0], row[1]) for row in result]
 
             print(f"Resultados da consulta simplificada: {genre_counts}")
@@ -151,7 +263,7 @@ def get_movie_stats(
             if not genre_counts:
                 print("A consulta simplificada retornou uma lista vazia")
                 # Tentar obter apenas os gêneros sem contagem
-                genres = db.query(models.Genre.name).limit(10).all()
+                genres = (await db.execute(select(models.Genre.name).limit(10))).all()
                 top_genres = [{"name": genre[0], "movie_count": 0} for genre in genres]
             else:
                 top_genres = [
@@ -164,18 +276,18 @@ def get_movie_stats(
             # Fallback para uma solução ainda mais simples - apenas listar os gêneros
             try:
                 print("Tentando fallback para lista simples de gêneros")
-                genres = db.query(models.Genre.name).limit(10).all()
+                genres = (await db.execute(select(models.Genre.name).limit(10))).all()
                 top_genres = [{"name": genre[0], "movie_count": 0} for genre in genres]
             except Exception as inner_e:
                 print(f"Erro no fallback: {str(inner_e)}")
                 top_genres = []
 
-        return {
+        return cache_response(request, schemas.MovieStats, {
             "total_movies": total_movies,
             "total_ratings": total_ratings,
             "average_rating": avg_rating,
             "top_genres": top_genres
-        }
+        })
     except Exception as e:
         # Log do erro para depuração
         print(f"Erro ao obter estatísticas: {str(e)}")
@@ -188,9 +300,9 @@ def get_movie_stats(
         }
 
 @router.get("/reload-genres", response_model=dict)
-def reload_genres(
+async def reload_genres(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
 ) -> Any:
     """
     Endpoint administrativo para recarregar os gêneros padrão e corrigir associações.
@@ -214,12 +326,12 @@ def reload_genres(
 
         for genre_name in default_genres:
             # Verificar se o gênero já existe
-            genre = db.query(models.Genre).filter(models.Genre.name == genre_name).first()
+            genre = await db.scalar(select(models.Genre).where(models.Genre.name == genre_name))
             if not genre:
                 # Criar o gênero
                 genre = models.Genre(name=genre_name)
                 db.add(genre)
-                db.flush()  # Obter ID sem commit
+                await db.flush()  # Obter ID sem commit
                 created += 1
             else:
                 already_exists += 1
@@ -228,7 +340,7 @@ def reload_genres(
             genre_objects[genre_name] = genre
 
         # Commit das mudanças antes de verificar associações
-        db.commit()
+        await db.commit()
 
         # Verificar se há filmes sem gêneros e tentar corrigi-los
         movies_fixed = 0
@@ -243,13 +355,13 @@ def reload_genres(
         )
         LIMIT 100  -- Limitar para evitar sobrecarga
         """
-        result = db.execute(text(movies_without_genres_query))
+        result = await db.execute(text(movies_without_genres_query))
         movies_without_genres = [(row[0], row[1]) for row in result]
 
         # Atribuir gêneros aleatórios a filmes sem gêneros
         import random
         for movie_id, movie_title in movies_without_genres:
-            movie = db.query(models.Movie).filter(models.Movie.id == movie_id).first()
+            movie = await db.get(models.Movie, movie_id)
             if movie:
                 # Escolher 1-3 gêneros aleatórios
                 random_genres = random.sample(list(genre_objects.values()),
@@ -260,23 +372,27 @@ def reload_genres(
                     SELECT 1 FROM movie_genre
                     WHERE movie_id = {movie_id} AND genre_id = {genre.id}
                     """
-                    result = db.execute(text(association_exists_query))
+                    result = await db.execute(text(association_exists_query))
                     if not result.first():
                         # Criar a associação diretamente na tabela de junção
                         insert_query = f"""
                         INSERT INTO movie_genre (movie_id, genre_id)
                         VALUES ({movie_id}, {genre.id})
                         """
-                        db.execute(text(insert_query))
+                        await db.execute(text(insert_query))
                         associations_created += 1
 
                 movies_fixed += 1
 
-        # Finalizar transação
-        db.commit()
+        # Finalizar transação (com as máscaras de gêneros recalculadas) e
+        # atualizar o índice de gêneros em memória
+        await db.run_sync(update_genre_masks)
+        await db.commit()
+        await db.run_sync(lambda session: refresh_genre_index(session, force=True))
+        await db.run_sync(refresh_title_index)
 
         # Verificar a associação de filmes e gêneros
-        movie_genre_count = db.query(func.count(models.movie_genre.c.movie_id)).scalar() or 0
+        movie_genre_count = await db.scalar(select(func.count(models.movie_genre.c.movie_id))) or 0
 
         return {
             "success": True,
@@ -289,30 +405,30 @@ def reload_genres(
             "associations_created": associations_created
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         return {
             "success": False,
             "message": f"Erro ao recarregar gêneros: {str(e)}"
         }
 
 @router.get("/debug/movie-genre-status", response_model=dict)
-def debug_movie_genre_relationships(
+async def debug_movie_genre_relationships(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
 ) -> Any:
     """
     Endpoint de diagnóstico para verificar a integridade das associações entre filmes e gêneros.
     """
     try:
         # Contagens básicas
-        total_movies = db.query(func.count(models.Movie.id)).scalar() or 0
-        total_genres = db.query(func.count(models.Genre.id)).scalar() or 0
+        total_movies = await db.scalar(select(func.count(models.Movie.id))) or 0
+        total_genres = await db.scalar(select(func.count(models.Genre.id))) or 0
 
         # Verificar associações existentes
         association_query = """
         SELECT COUNT(*) FROM movie_genre
         """
-        result = db.execute(text(association_query))
+        result = await db.execute(text(association_query))
         total_associations = result.scalar() or 0
 
         # Filmes sem gêneros
@@ -323,7 +439,7 @@ def debug_movie_genre_relationships(
             WHERE mg.movie_id = m.id
         )
         """
-        result = db.execute(text(movies_without_genres_query))
+        result = await db.execute(text(movies_without_genres_query))
         movies_without_genres = result.scalar() or 0
 
         # Gêneros sem filmes
@@ -334,7 +450,7 @@ def debug_movie_genre_relationships(
             WHERE mg.genre_id = g.id
         )
         """
-        result = db.execute(text(genres_without_movies_query))
+        result = await db.execute(text(genres_without_movies_query))
         genres_without_movies = result.scalar() or 0
 
         # Top 5 filmes com mais gêneros
@@ -346,7 +462,7 @@ def debug_movie_genre_relationships(
         ORDER BY genre_count DESC
         LIMIT 5
         """
-        result = db.execute(text(top_movies_query))
+        result = await db.execute(text(top_movies_query))
         top_movies = [{"title": row[0], "genre_count": row[1]} for row in result]
 
         # Lista de todos os gêneros com contagem
@@ -357,7 +473,7 @@ def debug_movie_genre_relationships(
         GROUP BY g.id, g.name
         ORDER BY movie_count DESC
         """
-        result = db.execute(text(all_genres_query))
+        result = await db.execute(text(all_genres_query))
         all_genres = [{"name": row[0], "movie_count": row[1]} for row in result]
 
         return {
@@ -1,21 +1,52 @@
-from typing import Any, List
+from typing import Any, Callable, List, Optional, TypeVar
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
 from app import models, schemas
 from app.api import deps
-from app.services.recommendation import get_recommendations_for_user, get_similar_movies
-from app.models.movie import movie_genre
+from app.database.session import SessionLocal
+from app.services.catalog import get_genre_index, rank_by_genre_overlap
+from app.services.recommendation import (
+    get_precomputed_recommendations, get_recommendations_for_user, get_similar_movies
+)
+from app.services.ranking import popular_movies_select
 
 router = APIRouter()
 
+T = TypeVar("T")
+
+def _with_session(fn: Callable[..., T], *args: Any) -> T:
+    """Executa fn(db, *args) com uma sessão síncrona própria (para uso em uma thread)."""
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+async def _movies_in_order(db: AsyncSession, movie_ids: List[int]) -> List[models.Movie]:
+    """Carrega os filmes pelos IDs internos, preservando a ordem do ranking."""
+    result = await db.scalars(
+        select(models.Movie).options(selectinload(models.Movie.genres)).where(models.Movie.id.in_(movie_ids))
+    )
+    movies = {movie.id: movie for movie in result}
+    return [movies[movie_id] for movie_id in movie_ids if movie_id in movies]
+
+async def _popular_movies(db: AsyncSession, limit: int, exclude_id: Optional[int] = None) -> List[models.Movie]:
+    """Filmes mais bem avaliados pela pontuação bayesiana."""
+    statement = popular_movies_select().options(selectinload(models.Movie.genres))
+    if exclude_id is not None:
+        statement = statement.where(models.Movie.id != exclude_id)
+    return list(await db.scalars(statement.limit(limit)))
+
 @router.get("/user", response_model=List[schemas.Movie])
-def get_user_recommendations(
+async def get_user_recommendations(
     *,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_async_db),
+    current_user: schemas.User = Depends(deps.get_current_active_user),
     limit: int = 10
 ) -> Any:
     """
@@ -23,66 +54,55 @@ def get_user_recommendations(
     Prioriza recomendações baseadas nos favoritos do usuário,
     mas também considera avaliações se disponíveis.
     """
-    # Verificar se o usuário tem favoritos
-    favorite_count = db.query(models.Favorite).filter(models.Favorite.user_id == current_user.id).count()
-
-    if favorite_count > 0:
-        # Obter IDs dos filmes favoritos do usuário
-        favorite_movies = (
-            db.query(models.Movie)
-            .join(models.Favorite)
-            .filter(models.Favorite.user_id == current_user.id)
-            .all()
-        )
+    # Obter os filmes favoritos do usuário (com seus gêneros)
+    favorite_movies = list(await db.scalars(
+        select(models.Movie)
+        .join(models.Favorite)
+        .where(models.Favorite.user_id == current_user.id)
+        .options(selectinload(models.Movie.genres))
+    ))
 
+    if favorite_movies:
         # Obter gêneros dos filmes favoritos
         favorite_genres = set()
         for movie in favorite_movies:
             for genre in movie.genres:
                 favorite_genres.add(genre.id)
 
-        # Encontrar filmes semelhantes baseados nos gêneros favoritos, excluindo os já favoritados
+        # Encontrar filmes semelhantes baseados nos gêneros favoritos, excluindo os já favoritados,
+        # ordenados por número de gêneros em comum no índice de gêneros em memória
         favorite_movie_ids = [movie.id for movie in favorite_movies]
-        recommendations = (
-            db.query(models.Movie)
-            .join(movie_genre)
-            .filter(movie_genre.c.genre_id.in_(favorite_genres))
-            .filter(~models.Movie.id.in_(favorite_movie_ids))  # Excluir filmes já favoritados
-            .group_by(models.Movie.id)
-            .order_by(func.count().desc())  # Ordenar por número de gêneros em comum
-            .limit(limit)
-        ).all()
+        genre_index = await db.run_sync(get_genre_index)
+        recommendations = await _movies_in_order(
+            db,
+            rank_by_genre_overlap(genre_index, favorite_genres, limit, exclude_ids=favorite_movie_ids)
+        )
 
         if recommendations:
             return recommendations
 
-    # Se não há favoritos ou não conseguimos recomendações baseadas neles,
-    # verificar avaliações
-    rating_count = db.query(models.Rating).filter(models.Rating.user_id == current_user.id).count()
+    # Se não há favoritos ou não conseguimos recomendações baseadas neles, verificar avaliações
+    rating_count = await db.scalar(
+        select(func.count(models.Rating.id)).where(models.Rating.user_id == current_user.id)
+    )
     if rating_count < 5:
         # Se não há avaliações suficientes, retornar filmes populares
-        popular_movies = (
-            db.query(models.Movie)
-            .join(models.Rating)
-            .group_by(models.Movie.id)
-            .order_by(func.avg(models.Rating.rating).desc())
-            .limit(limit)
-        ).all()
-        return popular_movies
-
-    # Se há avaliações suficientes, usar o método de recomendação colaborativa
-    movie_ids = get_recommendations_for_user(db, current_user.id, limit)
-    movies = (
-        db.query(models.Movie)
-        .filter(models.Movie.id.in_(movie_ids))
-        .all()
-    )
-    return movies
+        return await _popular_movies(db, limit)
+
+    # Usar a lista pré-calculada em lote, se as avaliações do usuário não mudaram desde então
+    precomputed_ids = await db.run_sync(get_precomputed_recommendations, current_user.id, rating_count, limit)
+    if precomputed_ids is not None:
+        return await _movies_in_order(db, precomputed_ids)
+
+    # Se há avaliações suficientes, usar o método de recomendação colaborativa.
+    # A pontuação (NumPy/SciPy) roda em uma thread para não bloquear o loop de eventos
+    movie_ids = await run_in_threadpool(_with_session, get_recommendations_for_user, current_user.id, limit)
+    return await _movies_in_order(db, movie_ids)
 
 @router.get("/similar/{movie_id}", response_model=List[schemas.Movie])
-def get_similar_movies_endpoint(
+async def get_similar_movies_endpoint(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     movie_id: int,
     limit: int = 10
 ) -> Any:
@@ -90,7 +110,9 @@ def get_similar_movies_endpoint(
     Obtém filmes similares ao filme especificado
     """
     # Verificar se o filme existe
-    movie = db.query(models.Movie).filter(models.Movie.movie_id == movie_id).first()
+    movie = await db.scalar(
+        select(models.Movie).options(selectinload(models.Movie.genres)).where(models.Movie.movie_id == movie_id)
+    )
     if not movie:
         raise HTTPException(status_code=404, detail="Filme não encontrado")
 
@@ -99,27 +121,12 @@ def get_similar_movies_endpoint(
         # Obter gêneros do filme
         genre_ids = [genre.id for genre in movie.genres]
 
-        # Encontrar filmes com gêneros semelhantes
-        similar_movies = (
-            db.query(models.Movie)
-            .join(movie_genre)
-            .filter(movie_genre.c.genre_id.in_(genre_ids))
-            .filter(models.Movie.id != movie.id)  # Excluir o próprio filme
-            .group_by(models.Movie.id)
-            .order_by(func.count().desc())  # Ordenar por número de gêneros em comum
-            .limit(limit)
-        ).all()
-
-        return similar_movies
+        # Encontrar filmes com gêneros semelhantes (excluindo o próprio filme),
+        # ordenados por número de gêneros em comum
+        genre_index = await db.run_sync(get_genre_index)
+        similar_ids = rank_by_genre_overlap(genre_index, genre_ids, limit, exclude_ids=[movie.id])
+
+        return await _movies_in_order(db, similar_ids)
     else:
         # Se o filme não tiver gêneros, retornar filmes populares
-        popular_movies = (
-            db.query(models.Movie)
-            .join(models.Rating)
-            .group_by(models.Movie.id)
-            .order_by(func.avg(models.Rating.rating).desc())
-            .filter(models.Movie.id != movie.id)
-            .limit(limit)
-        ).all()
-
-        return popular_movies
\ No newline at end of file
+        return await _popular_movies(db, limit, exclude_id=movie.id)
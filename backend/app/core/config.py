@@ -1,5 +1,5 @@
 import secrets
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
 from pydantic import AnyHttpUrl, Field, validator
 from pydantic_settings import BaseSettings
@@ -24,9 +24,56 @@ class Settings(BaseSettings):
 
     PROJECT_NAME: str = "MovieLens Challenge API"
 
+    # Cache dos usuários autenticados (evita consultar users a cada requisição)
+    # Segundos até revalidar um usuário no banco (0 desativa o cache)
+    USER_CACHE_TTL_SECONDS: int = 60
+    # Número máximo de usuários guardados
+    USER_CACHE_SIZE: int = 10000
+
     # Configurações do Banco de Dados
     DATABASE_URL: str = "sqlite:///./movielens.db"
 
+    # Configurações do ETL
+    # Processos que leem e transformam os CSVs em paralelo à gravação (0 usa o número de CPUs)
+    ETL_WORKERS: int = 0
+    # Blocos lidos por arquivo aguardando gravação (limita a memória do ETL)
+    ETL_QUEUE_SIZE: int = 4
+
+    # Configurações do sistema de recomendação
+    # Motor colaborativo: "item_knn" (vizinhos por cosseno) ou "mf" (fatoração por SVD truncada)
+    RECOMMENDER_ENGINE: Literal["item_knn", "mf"] = "item_knn"
+    # Número de fatores latentes do motor "mf"
+    RECOMMENDER_FACTORS: int = 64
+    # Número de vizinhos mantidos por filme no índice de similaridade
+    RECOMMENDER_NEIGHBORS: int = 50
+    # Linhas por bloco no cálculo da similaridade (memória ~ bloco x filmes x 8 bytes)
+    RECOMMENDER_BLOCK_SIZE: int = 256
+    # Aplicar novas avaliações incrementalmente em vez de reconstruir o modelo
+    RECOMMENDER_INCREMENTAL: bool = True
+    # Intervalo mínimo entre reconstruções completas do modelo (6 horas)
+    RECOMMENDER_FULL_REBUILD_SECONDS: int = 60 * 60 * 6
+    # Intervalo com que o atualizador em segundo plano procura novas avaliações
+    RECOMMENDER_REFRESH_SECONDS: int = 30
+    # Diretório dos artefatos versionados do modelo (vazio desativa a persistência)
+    RECOMMENDER_ARTIFACT_DIR: str = "./model_artifacts"
+    # Quantidade de filmes gravada por usuário na pré-computação em lote
+    RECOMMENDER_PRECOMPUTE_TOP_N: int = 50
+
+    # Configurações do ranking de popularidade
+    # Peso (em número de avaliações) da média global na pontuação bayesiana
+    RANKING_PRIOR_WEIGHT: int = 10
+    # Mínimo de avaliações para um filme aparecer em /movies/top-rated
+    RANKING_MIN_RATINGS: int = 5
+
+    # Cache de respostas dos endpoints de leitura de filmes
+    # Memória máxima das respostas guardadas (0 desativa o cache)
+    RESPONSE_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # max-age do Cache-Control; depois disso clientes e proxies revalidam com o ETag
+    RESPONSE_CACHE_MAX_AGE: int = 30
+    # Montar as páginas de MovieList (busca e top-rated) a partir de colunas,
+    # serializadas com orjson, em vez de objetos ORM validados pelo Pydantic
+    MOVIE_LIST_FAST_PATH: bool = True
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -1,5 +1,5 @@
 from app.database.session import Base, engine
-from app.models import User, Movie, Genre, Rating, Tag, Favorite
+from app.models import User, Movie, Genre, Rating, Tag, Favorite, UserRecommendation, MovieRanking, EtlFileState
 
 def create_tables():
     """Cria todas as tabelas no banco de dados"""
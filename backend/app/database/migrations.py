@@ -0,0 +1,28 @@
+import logging
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.engine import Engine
+
+# Configuração do logger
+logger = logging.getLogger("app.migrations")
+
+# backend/alembic.ini
+ALEMBIC_INI = Path(__file__).resolve().parent.parent.parent / "alembic.ini"
+
+def alembic_config() -> Config:
+    """Configuração do Alembic do projeto (alembic.ini e diretório alembic/)."""
+    return Config(str(ALEMBIC_INI))
+
+def run_migrations(engine: Engine) -> None:
+    """
+    Aplica as migrações pendentes (alembic upgrade head) no banco do engine.
+    As tabelas são criadas antes por create_all; as migrações cuidam do que
+    create_all não altera em bancos existentes, como novas colunas e índices.
+    """
+    config = alembic_config()
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+    logger.info("Migrações do banco aplicadas.")
@@ -5,6 +5,7 @@ import logging
 from app.api.api import api_router
 from app.core.config import settings
 from app.utils.etl import init_app_data
+from app.services.recommendation import start_model_refresher
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO)
@@ -24,6 +25,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # cursor da próxima página de /favorites
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -37,6 +39,7 @@ async def startup_event():
     """Evento executado na inicialização da aplicação."""
     logger.info("Iniciando a aplicação...")
     init_app_data()  # Iniciar ETL em segundo plano
+    start_model_refresher()  # Manter o modelo de recomendação atualizado fora das requisições
 
 if __name__ == "__main__":
     import uvicorn
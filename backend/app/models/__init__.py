@@ -1,5 +1,8 @@
 from app.models.user import User
-from app.models.movie import Movie, Genre
+from app.models.movie import Movie, Genre, movie_genre
 from app.models.rating import Rating
 from app.models.tag import Tag
-from app.models.favorite import Favorite
\ No newline at end of file
+from app.models.favorite import Favorite
+from app.models.user_recommendation import UserRecommendation
+from app.models.movie_ranking import MovieRanking
+from app.models.etl_state import EtlFileState
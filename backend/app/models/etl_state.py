@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, BigInteger
+
+from app.database.session import Base
+
+class EtlFileState(Base):
+    __tablename__ = "etl_file_state"
+
+    # Marca d'água de cada arquivo do MovieLens, mantida por app/utils/etl_state.py:
+    # bytes já importados (até o fim do último bloco gravado) e o SHA-256 deles
+    file_name = Column(String, primary_key=True)  # Nome do arquivo, como "ratings.csv"
+    byte_offset = Column(BigInteger, nullable=False)
+    checksum = Column(String, nullable=False)
+    updated_at = Column(BigInteger, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Table, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Table, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 from app.database.session import Base
@@ -9,6 +9,8 @@ movie_genre = Table(
     Base.metadata,
     Column("movie_id", Integer, ForeignKey("movies.id"), primary_key=True),
     Column("genre_id", Integer, ForeignKey("genres.id"), primary_key=True),
+    # A chave primária (movie_id, genre_id) não serve a buscas por gênero
+    Index("ix_movie_genre_genre_movie", "genre_id", "movie_id"),
 )
 
 class Movie(Base):
@@ -21,22 +23,21 @@ class Movie(Base):
     imdb_id = Column(String, nullable=True)
     tmdb_id = Column(String, nullable=True)
 
+    # Agregados das avaliações, mantidos por app/services/ranking.py para que a
+    # serialização nunca carregue o relacionamento `ratings`
+    average_rating = Column(Float, nullable=False, default=0.0, server_default="0")
+    rating_count = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # Gêneros do filme como bits (bit genre_id - 1), mantido por app/services/catalog.py;
+    # filtros por vários gêneros viram um único predicado bit a bit
+    genre_mask = Column(Integer, nullable=False, default=0, server_default="0")
+
     # Relacionamentos
     genres = relationship("Genre", secondary=movie_genre, back_populates="movies")
     ratings = relationship("Rating", back_populates="movie")
     tags = relationship("Tag", back_populates="movie")
     favorited_by = relationship("Favorite", back_populates="movie")
 
-    @property
-    def average_rating(self):
-        if not self.ratings or len(self.ratings) == 0:
-            return 0.0
-        return sum(r.rating for r in self.ratings) / len(self.ratings)
-
-    @property
-    def rating_count(self):
-        return len(self.ratings)
-
 
 class Genre(Base):
     __tablename__ = "genres"
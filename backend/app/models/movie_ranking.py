@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index
+
+from app.database.session import Base
+
+class MovieRanking(Base):
+    __tablename__ = "movie_rankings"
+
+    # Agregados de avaliações por filme, mantidos por app/services/ranking.py
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    rating_mean = Column(Float, nullable=False)
+    rating_count = Column(Integer, nullable=False)
+    bayesian_score = Column(Float, nullable=False)
+
+    # Leituras ordenadas por pontuação viram varreduras de faixa no índice
+    __table_args__ = (
+        Index("ix_movie_rankings_score", "bayesian_score", "movie_id"),
+    )
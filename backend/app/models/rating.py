@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, ForeignKey, BigInteger
+from sqlalchemy import Column, Integer, Float, ForeignKey, BigInteger, Index
 from sqlalchemy.orm import relationship
 
 from app.database.session import Base
@@ -12,6 +12,14 @@ class Rating(Base):
     rating = Column(Float)
     timestamp = Column(BigInteger, nullable=True)
 
+    # Índices de cobertura (o id, rowid no SQLite, vem em toda entrada de índice):
+    # agregações por filme (ranking, estatísticas) e consultas por usuário
+    # (recomendações, verificação do lote pré-calculado, ETL)
+    __table_args__ = (
+        Index("ix_ratings_movie_rating", "movie_id", "rating"),
+        Index("ix_ratings_user_movie", "user_id", "movie_id"),
+    )
+
     # Relacionamentos
     user = relationship("User", back_populates="ratings")
     movie = relationship("Movie", back_populates="ratings")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, BigInteger
+from sqlalchemy import Column, Integer, String, ForeignKey, BigInteger, Index
 from sqlalchemy.orm import relationship
 
 from app.database.session import Base
@@ -12,6 +12,13 @@ class Tag(Base):
     tag = Column(String)
     timestamp = Column(BigInteger, nullable=True)
 
+    # Tags de um filme (Movie.tags); uma tag por (usuário, filme, texto), o que
+    # sustenta a deduplicação do ETL
+    __table_args__ = (
+        Index("ix_tags_movie_id", "movie_id"),
+        Index("ix_tags_user_movie_tag", "user_id", "movie_id", "tag", unique=True),
+    )
+
     # Relacionamentos
     user = relationship("User", back_populates="tags")
     movie = relationship("Movie", back_populates="tags")
\ No newline at end of file
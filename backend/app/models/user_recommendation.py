@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, JSON
+
+from app.database.session import Base
+
+class UserRecommendation(Base):
+    __tablename__ = "user_recommendations"
+
+    # Recomendações pré-calculadas em lote (scripts/precompute_recommendations.py)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    movie_ids = Column(JSON, nullable=False)  # IDs internos dos filmes, em ordem de pontuação
+    last_rating_id = Column(Integer, nullable=False)  # Maior Rating.id considerado pelo lote
+    rating_count = Column(Integer, nullable=True)  # Avaliações do usuário consideradas pelo lote
+    model_version = Column(String, nullable=False)
+    created_at = Column(BigInteger, nullable=False)
@@ -1,6 +1,6 @@
 from app.schemas.movie import (
     Genre, GenreCreate, GenreBase,
-    Movie, MovieCreate, MovieBase, MovieList, MovieStats
+    Movie, MovieCreate, MovieBase, MovieList, MovieStats, MovieSuggestion
 )
 from app.schemas.user import (
     User, UserCreate, UserUpdate, UserBase,
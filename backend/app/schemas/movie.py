@@ -38,7 +38,15 @@ class Movie(MovieBase):
 # Schema para lista de filmes com paginação
 class MovieList(BaseModel):
     items: List[Movie]
-    total: int
+    total: Optional[int] = None  # omitido com include_total=false
+    next_cursor: Optional[str] = None  # None na última página
+
+# Schema para sugestões de títulos (autocompletar)
+class MovieSuggestion(BaseModel):
+    id: int
+    movie_id: int
+    title: str
+    year: Optional[int] = None
 
 # Schema para estatísticas de filmes
 class MovieStats(BaseModel):
@@ -0,0 +1,305 @@
+import re
+import bisect
+import threading
+import logging
+import unicodedata
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.services.ranking import rankings_version
+
+# Configuração do logger
+logger = logging.getLogger("app.catalog")
+
+# Gêneros com id acima deste não cabem em movies.genre_mask (INTEGER de 64 bits com sinal)
+MAX_GENRE_ID = 63
+
+# Contagem de bits por byte, para versões do NumPy sem np.bitwise_count
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Contagem e maior id de movies, total de associações filme-gênero e checksums
+# de movies.csv/links.csv importados pelo ETL
+CatalogVersion = Tuple[int, int, int, Tuple[str, ...]]
+
+class GenreIndex(NamedTuple):
+    """
+    Gêneros de todo o catálogo como uma máscara de bits por filme.
+
+    `movie_ids` guarda os IDs internos em ordem crescente e `masks[i]` os
+    gêneros de `movie_ids[i]` (a coluna movies.genre_mask), um bit por gênero
+    segundo `genre_bits`. `genre_ids_by_name` resolve nomes de gêneros.
+    """
+    movie_ids: np.ndarray
+    masks: np.ndarray
+    genre_bits: Dict[int, int]
+    genre_ids_by_name: Dict[str, int]
+    version: CatalogVersion
+
+class TitleIndex(NamedTuple):
+    """
+    Títulos normalizados em ordem, para autocompletar por prefixo com bisect.
+
+    `keys[i]` é a chave de `rows[i]`, uma linha dos arrays de filmes (`ids`,
+    `movie_ids`, `titles`, `years`, `popularity`). Um filme pode ter duas
+    chaves: "matrix the" e "the matrix" para "Matrix, The". A versão junta o
+    estado do catálogo e o do ranking, de onde vem a popularidade.
+    """
+    keys: List[str]
+    rows: np.ndarray
+    ids: np.ndarray
+    movie_ids: np.ndarray
+    titles: List[str]
+    years: List[Optional[int]]
+    popularity: np.ndarray
+    version: Tuple[CatalogVersion, Optional[Tuple[int, int]]]
+
+# Artigos que o MovieLens move para o fim do título ("Matrix, The")
+_TRAILING_ARTICLE = re.compile(
+    r"^(?P<title>.+), (?P<article>the|a|an|les|la|le|l'|el|il|los|las|die|der|das)$", re.IGNORECASE
+)
+_YEAR_SUFFIX = re.compile(r"\s*\(\d{4}\)\s*$")
+
+# Índices publicados; substituídos por inteiro a cada reconstrução
+_genre_index: Optional[GenreIndex] = None
+_genre_index_lock = threading.Lock()
+_title_index: Optional[TitleIndex] = None
+_title_index_lock = threading.Lock()
+
+def _catalog_version(db: Session) -> CatalogVersion:
+    """Estado de movies/movie_genre que, ao mudar, exige reconstruir o índice."""
+    movie_count, max_movie_id = db.query(func.count(models.Movie.id), func.max(models.Movie.id)).one()
+    genre_links = db.query(func.count()).select_from(models.movie_genre).scalar()
+    # Títulos e gêneros trocados no lugar pelo ETL não mudam as contagens; o
+    # checksum dos arquivos do catálogo muda a cada recarga deles
+    checksums = tuple(db.scalars(
+        select(models.EtlFileState.checksum)
+        .where(models.EtlFileState.file_name.in_(("movies.csv", "links.csv")))
+        .order_by(models.EtlFileState.file_name)
+    ))
+    return movie_count, max_movie_id or 0, genre_links, checksums
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    """Número de bits ligados em cada elemento."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    as_bytes = values.view(np.uint8).reshape(values.shape[0], values.itemsize)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=1)
+
+def genre_bit(genre_id: int) -> int:
+    """Posição do gênero em movies.genre_mask."""
+    return genre_id - 1
+
+def update_genre_masks(db: Session) -> None:
+    """
+    Recalcula movies.genre_mask a partir de movie_genre com um único UPDATE
+    (a soma de potências distintas de 2 equivale ao OU dos bits). Não faz commit.
+    """
+    max_genre_id = db.query(func.max(models.Genre.id)).scalar() or 0
+    if max_genre_id > MAX_GENRE_ID:
+        raise ValueError(f"Gênero com id {max_genre_id} não cabe em uma máscara de 64 bits")
+
+    links = models.movie_genre.c
+    db.execute(
+        update(models.Movie).values(
+            genre_mask=func.coalesce(
+                select(func.sum(literal(1).op("<<")(links.genre_id - 1)))
+                .where(links.movie_id == models.Movie.id)
+                .scalar_subquery(),
+                0
+            )
+        )
+    )
+
+def _build_genre_index(db: Session, version: CatalogVersion) -> GenreIndex:
+    genres = db.query(models.Genre.id, models.Genre.name).all()
+    max_genre_id = max((genre_id for genre_id, _ in genres), default=0)
+    dtype = np.uint32 if max_genre_id <= 32 else np.uint64
+
+    rows = db.query(models.Movie.id, models.Movie.genre_mask).order_by(models.Movie.id).all()
+    movies = np.array(rows, dtype=np.int64).reshape(-1, 2)
+
+    return GenreIndex(
+        movie_ids=movies[:, 0].copy(),
+        masks=movies[:, 1].astype(dtype),
+        genre_bits={genre_id: genre_bit(genre_id) for genre_id, _ in genres if genre_id <= MAX_GENRE_ID},
+        genre_ids_by_name={name: genre_id for genre_id, name in genres},
+        version=version,
+    )
+
+def refresh_genre_index(db: Session, force: bool = False) -> bool:
+    """
+    Reconstrói o índice de gêneros quando movies ou movie_genre mudaram.
+    Retorna True se o índice foi reconstruído.
+    """
+    global _genre_index
+
+    with _genre_index_lock:
+        version = _catalog_version(db)
+        if not force and _genre_index is not None and _genre_index.version == version:
+            return False
+
+        _genre_index = _build_genre_index(db, version)
+        logger.info(f"Índice de gêneros reconstruído ({_genre_index.movie_ids.shape[0]} filmes)")
+        return True
+
+def catalog_version() -> Optional[CatalogVersion]:
+    """Estado de movies/movie_genre refletido hoje no índice de gêneros publicado."""
+    index = _genre_index
+    return index.version if index is not None else None
+
+def get_genre_index(db: Session) -> GenreIndex:
+    """Índice publicado, construído na primeira chamada."""
+    index = _genre_index
+    if index is None:
+        refresh_genre_index(db)
+        index = _genre_index
+    return index
+
+def genre_filter(index: GenreIndex, genre_names: Iterable[str], match_all: bool = True) -> Optional[Any]:
+    """
+    Predicado único sobre movies.genre_mask para os gêneros informados pelo
+    nome: todos os gêneros (match_all) ou qualquer um deles. Nomes
+    desconhecidos são ignorados; retorna None se nenhum for reconhecido.
+    """
+    genre_ids = [index.genre_ids_by_name[name] for name in genre_names if name in index.genre_ids_by_name]
+    mask = int(genre_mask(index, genre_ids))
+    if mask == 0:
+        return None
+
+    matched = models.Movie.genre_mask.op("&")(mask)
+    return matched == mask if match_all else matched != 0
+
+def genre_mask(index: GenreIndex, genre_ids: Iterable[int]) -> np.integer:
+    """Máscara com os bits dos gêneros informados (gêneros desconhecidos são ignorados)."""
+    mask = index.masks.dtype.type(0)
+    for genre_id in genre_ids:
+        bit = index.genre_bits.get(genre_id)
+        if bit is not None:
+            mask |= index.masks.dtype.type(1) << index.masks.dtype.type(bit)
+    return mask
+
+def rank_by_genre_overlap(
+    index: GenreIndex,
+    genre_ids: Iterable[int],
+    limit: int,
+    exclude_ids: Optional[Iterable[int]] = None
+) -> List[int]:
+    """
+    IDs internos dos filmes com mais gêneros em comum com `genre_ids`, em ordem
+    decrescente de sobreposição (empates pelo menor ID). Filmes sem nenhum
+    gênero em comum não são retornados.
+    """
+    overlap = _popcount(index.masks & genre_mask(index, genre_ids)).astype(np.int64)
+    if exclude_ids:
+        overlap[np.isin(index.movie_ids, list(exclude_ids))] = 0
+
+    candidates = np.flatnonzero(overlap)
+    if limit <= 0 or candidates.shape[0] == 0:
+        return []
+
+    # Chave única por filme: sobreposição primeiro, depois a posição (menor ID vence)
+    n_movies = index.movie_ids.shape[0]
+    keys = overlap[candidates] * n_movies + (n_movies - 1 - candidates)
+    if candidates.shape[0] > limit:
+        top = np.argpartition(-keys, limit - 1)[:limit]
+    else:
+        top = np.arange(candidates.shape[0])
+    top = top[np.argsort(-keys[top])]
+    return index.movie_ids[candidates[top]].tolist()
+
+def normalize_title(title: str) -> str:
+    """Minúsculas, sem acentos e com pontuação reduzida a espaços simples."""
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(char for char in title if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", title.lower()))
+
+def _title_keys(title: str) -> List[str]:
+    """Chaves de busca do título, incluindo a forma com o artigo no início."""
+    title = _YEAR_SUFFIX.sub("", title)
+    keys = [normalize_title(title)]
+    match = _TRAILING_ARTICLE.match(title)
+    if match:
+        keys.append(normalize_title(f"{match.group('article')} {match.group('title')}"))
+    return [key for key in keys if key]
+
+def _build_title_index(db: Session, version: Tuple[CatalogVersion, Optional[Tuple[int, int]]]) -> TitleIndex:
+    movies = (
+        db.query(
+            models.Movie.id, models.Movie.movie_id, models.Movie.title,
+            models.Movie.year, models.Movie.rating_count
+        )
+        .order_by(models.Movie.id)
+        .all()
+    )
+
+    entries = sorted(
+        (key, row)
+        for row, movie in enumerate(movies)
+        for key in _title_keys(movie.title or "")
+    )
+    return TitleIndex(
+        keys=[key for key, _ in entries],
+        rows=np.array([row for _, row in entries], dtype=np.int64),
+        ids=np.array([movie.id for movie in movies], dtype=np.int64),
+        movie_ids=np.array([movie.movie_id for movie in movies], dtype=np.int64),
+        titles=[movie.title for movie in movies],
+        years=[movie.year for movie in movies],
+        popularity=np.array([movie.rating_count or 0 for movie in movies], dtype=np.int64),
+        version=version,
+    )
+
+def refresh_title_index(db: Session, force: bool = False) -> bool:
+    """
+    Reconstrói o índice de títulos quando o catálogo mudou ou quando o ranking
+    foi recalculado (movies.rating_count, usado como popularidade, muda junto).
+    Retorna True se o índice foi reconstruído.
+    """
+    global _title_index
+
+    with _title_index_lock:
+        version = (_catalog_version(db), rankings_version())
+        if not force and _title_index is not None and _title_index.version == version:
+            return False
+
+        _title_index = _build_title_index(db, version)
+        logger.info(f"Índice de títulos reconstruído ({len(_title_index.keys)} chaves)")
+        return True
+
+def get_title_index(db: Session) -> TitleIndex:
+    """Índice publicado, construído na primeira chamada."""
+    index = _title_index
+    if index is None:
+        refresh_title_index(db)
+        index = _title_index
+    return index
+
+def suggest_titles(index: TitleIndex, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Filmes cujo título normalizado começa com `prefix`, os mais avaliados
+    primeiro. Busca binária no array ordenado de chaves, sem acessar o banco.
+    """
+    prefix = normalize_title(prefix)
+    if not prefix or limit <= 0:
+        return []
+
+    # Faixa [start, end) das chaves que começam com o prefixo
+    start = bisect.bisect_left(index.keys, prefix)
+    end = bisect.bisect_left(index.keys, prefix + "\uffff", lo=start)
+    rows = np.unique(index.rows[start:end])
+    if rows.shape[0] > limit:
+        rows = rows[np.argpartition(-index.popularity[rows], limit - 1)[:limit]]
+    rows = rows[np.lexsort((index.ids[rows], -index.popularity[rows]))]
+
+    return [
+        {
+            "id": int(index.ids[row]),
+            "movie_id": int(index.movie_ids[row]),
+            "title": index.titles[row],
+            "year": index.years[row],
+        }
+        for row in rows
+    ]
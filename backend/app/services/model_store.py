@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import tempfile
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+# Configuração do logger
+logger = logging.getLogger("app.model_store")
+
+# Arquivo com o nome da versão mais recente (para inspeção e ferramentas externas)
+CURRENT_FILE = "CURRENT"
+METADATA_FILE = "metadata.json"
+LOCK_FILE = ".lock"
+
+# Quantas versões antigas manter em disco além da atual
+KEEP_VERSIONS = 2
+
+
+def _version_dir(base_dir: str, version: str) -> str:
+    return os.path.join(base_dir, version)
+
+
+@contextmanager
+def artifact_lock(base_dir: str) -> Iterator[None]:
+    """
+    Trava exclusiva entre processos (workers) sobre o diretório de artefatos,
+    para que apenas um deles construa e grave uma nova versão por vez.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    with open(os.path.join(base_dir, LOCK_FILE), "a") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def save_artifact(base_dir: str, version: str, arrays: Dict[str, np.ndarray], metadata: Dict[str, Any]) -> str:
+    """
+    Grava os arrays como arquivos .npy em um diretório versionado.
+
+    Os arquivos são escritos em um diretório temporário que depois é renomeado,
+    e só então o ponteiro CURRENT é atualizado, de modo que leitores nunca
+    encontram uma versão pela metade.
+    """
+    os.makedirs(base_dir, exist_ok=True)
+    target_dir = _version_dir(base_dir, version)
+
+    if not os.path.isdir(target_dir):
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=base_dir)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            with open(os.path.join(tmp_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+                json.dump({**metadata, "version": version}, f)
+            os.replace(tmp_dir, target_dir)
+        except Exception:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+    # Atualizar o ponteiro de forma atômica
+    fd, tmp_pointer = tempfile.mkstemp(prefix=".tmp-", dir=base_dir)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_pointer, os.path.join(base_dir, CURRENT_FILE))
+
+    _prune_versions(base_dir, keep=version)
+    logger.info(f"Artefato do modelo gravado em {target_dir}")
+    return target_dir
+
+
+def load_artifact(base_dir: str, version: str) -> Optional[Tuple[Dict[str, np.ndarray], Dict[str, Any]]]:
+    """
+    Carrega uma versão com mmap_mode='r': os arrays ficam no page cache e são
+    compartilhados por todos os processos que abrirem a mesma versão.
+    Retorna None se a versão não existir em disco.
+    """
+    version_dir = _version_dir(base_dir, version)
+    metadata_path = os.path.join(version_dir, METADATA_FILE)
+    if not os.path.isfile(metadata_path):
+        return None
+
+    with open(metadata_path, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+
+    arrays = {}
+    for file_name in os.listdir(version_dir):
+        if file_name.endswith(".npy"):
+            arrays[file_name[:-4]] = np.load(os.path.join(version_dir, file_name), mmap_mode="r")
+
+    return arrays, metadata
+
+
+def _prune_versions(base_dir: str, keep: str) -> None:
+    """
+    Remove versões antigas, mantendo a atual e as KEEP_VERSIONS mais recentes.
+    Arquivos já mapeados por outros processos continuam válidos até serem fechados.
+    """
+    versions = [
+        entry for entry in os.scandir(base_dir)
+        if entry.is_dir() and not entry.name.startswith(".") and entry.name != keep
+    ]
+    versions.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+
+    for entry in versions[KEEP_VERSIONS:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def clear_artifacts(base_dir: str) -> None:
+    """
+    Remove todas as versões gravadas (usado quando as avaliações são
+    recarregadas: a mesma versão, maior id e total, passa a ter outros dados).
+    """
+    if not os.path.isdir(base_dir):
+        return
+    with artifact_lock(base_dir):
+        for entry in os.scandir(base_dir):
+            if entry.is_dir() and not entry.name.startswith("."):
+                shutil.rmtree(entry.path, ignore_errors=True)
+        current = os.path.join(base_dir, CURRENT_FILE)
+        if os.path.exists(current):
+            os.remove(current)
+    logger.info(f"Artefatos do modelo removidos de {base_dir}")
@@ -0,0 +1,71 @@
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app import models
+from app.services.catalog import GenreIndex
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele o json da biblioteca padrão é usado
+    orjson = None
+
+# Colunas de schemas.Movie lidas sem carregar objetos ORM. Os gêneros vêm de
+# movies.genre_mask, resolvidos pelo índice de gêneros em memória.
+MOVIE_ROW_COLUMNS = (
+    models.Movie.title,
+    models.Movie.year,
+    models.Movie.imdb_id,
+    models.Movie.tmdb_id,
+    models.Movie.id,
+    models.Movie.movie_id,
+    models.Movie.genre_mask,
+    models.Movie.average_rating,
+    models.Movie.rating_count,
+)
+
+def _genres_by_bit(index: GenreIndex) -> List[Tuple[int, Dict[str, Any]]]:
+    """(valor do bit, gênero serializado) de cada gênero, em ordem de id."""
+    names = {genre_id: name for name, genre_id in index.genre_ids_by_name.items()}
+    return [
+        (1 << bit, {"name": names[genre_id], "id": genre_id})
+        for genre_id, bit in sorted(index.genre_bits.items())
+    ]
+
+def movie_row_dict(row: Sequence[Any], genres_by_bit: List[Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Filme de uma linha com MOVIE_ROW_COLUMNS, na forma (e ordem de campos) de schemas.Movie."""
+    title, year, imdb_id, tmdb_id, id_, movie_id, genre_mask, average_rating, rating_count = row[:len(MOVIE_ROW_COLUMNS)]
+    return {
+        "title": title,
+        "year": year,
+        "imdb_id": imdb_id,
+        "tmdb_id": tmdb_id,
+        "id": id_,
+        "movie_id": movie_id,
+        "genres": [genre for bit, genre in genres_by_bit if genre_mask & bit],
+        "average_rating": float(average_rating) if average_rating is not None else None,
+        "rating_count": rating_count,
+    }
+
+def dumps(content: Any) -> bytes:
+    """JSON compacto em bytes (orjson quando instalado)."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def encode_movie_list(
+    index: GenreIndex,
+    rows: Sequence[Sequence[Any]],
+    total: Optional[int] = None,
+    next_cursor: Optional[str] = None
+) -> bytes:
+    """
+    Corpo JSON de schemas.MovieList a partir de linhas com MOVIE_ROW_COLUMNS
+    (colunas extras no fim, como as de ordenação, são ignoradas), sem validação
+    do Pydantic nem objetos ORM.
+    """
+    genres_by_bit = _genres_by_bit(index)
+    return dumps({
+        "items": [movie_row_dict(row, genres_by_bit) for row in rows],
+        "total": total,
+        "next_cursor": next_cursor,
+    })
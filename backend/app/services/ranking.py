@@ -0,0 +1,111 @@
+import threading
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Select, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+
+# Configuração do logger
+logger = logging.getLogger("app.ranking")
+
+# Estado das avaliações (maior id, total) refletido na tabela movie_rankings
+_rankings_version: Optional[Tuple[int, int]] = None
+_rankings_lock = threading.Lock()
+
+def refresh_movie_rankings(db: Session, force: bool = False) -> bool:
+    """
+    Recalcula a tabela movie_rankings (média, contagem e pontuação bayesiana de
+    cada filme) quando as avaliações mudaram. O recálculo é uma única instrução
+    INSERT ... SELECT ... GROUP BY executada fora das requisições, seguida da
+    cópia da média e da contagem para as colunas agregadas de movies.
+    Retorna True se a tabela foi recalculada.
+    """
+    global _rankings_version
+
+    with _rankings_lock:
+        version = tuple(db.query(func.max(models.Rating.id), func.count(models.Rating.id)).one())
+        if not force and version == _rankings_version:
+            return False
+
+        # Pontuação bayesiana: média ponderada entre a média do filme e a média global,
+        # com peso RANKING_PRIOR_WEIGHT para a média global
+        prior_weight = settings.RANKING_PRIOR_WEIGHT
+        global_mean = db.query(func.avg(models.Rating.rating)).scalar() or 0.0
+        rating_count = func.count(models.Rating.id)
+        aggregates = (
+            select(
+                models.Rating.movie_id,
+                func.avg(models.Rating.rating),
+                rating_count,
+                (func.sum(models.Rating.rating) + prior_weight * global_mean) / (rating_count + prior_weight),
+            )
+            .group_by(models.Rating.movie_id)
+        )
+
+        try:
+            db.query(models.MovieRanking).delete()
+            db.execute(
+                insert(models.MovieRanking).from_select(
+                    ["movie_id", "rating_mean", "rating_count", "bayesian_score"], aggregates
+                )
+            )
+            _copy_movie_aggregates(db)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+        _rankings_version = version
+        logger.info(f"Ranking de filmes recalculado (avaliações até o id {version[0]})")
+        return True
+
+def rankings_version() -> Optional[Tuple[int, int]]:
+    """Estado das avaliações (maior id, total) refletido hoje em movie_rankings."""
+    return _rankings_version
+
+def _copy_movie_aggregates(db: Session) -> None:
+    """
+    Copia média e contagem de movie_rankings para movies.average_rating e
+    movies.rating_count (filmes sem avaliações ficam com zero).
+    """
+    ranking = models.MovieRanking
+    by_movie = ranking.movie_id == models.Movie.id
+    db.execute(
+        update(models.Movie).values(
+            average_rating=func.coalesce(select(ranking.rating_mean).where(by_movie).scalar_subquery(), 0.0),
+            rating_count=func.coalesce(select(ranking.rating_count).where(by_movie).scalar_subquery(), 0),
+        )
+    )
+
+def popular_movies_select(min_ratings: int = 0) -> Select:
+    """
+    Consulta de filmes ordenada pela pontuação bayesiana (decrescente), lida pelo
+    índice de movie_rankings. Aceita offset/limit para paginação.
+    """
+    statement = (
+        select(models.Movie)
+        .join(models.MovieRanking, models.MovieRanking.movie_id == models.Movie.id)
+        .order_by(models.MovieRanking.bayesian_score.desc(), models.MovieRanking.movie_id.desc())
+    )
+    if min_ratings > 0:
+        statement = statement.where(models.MovieRanking.rating_count >= min_ratings)
+    return statement
+
+def get_popular_movie_ids(
+    db: Session,
+    limit: int = 10,
+    skip: int = 0,
+    exclude_ids: Optional[List[int]] = None
+) -> List[int]:
+    """
+    IDs internos dos filmes mais bem ranqueados, sem tocar na tabela de avaliações.
+    """
+    query = db.query(models.MovieRanking.movie_id).order_by(
+        models.MovieRanking.bayesian_score.desc(), models.MovieRanking.movie_id.desc()
+    )
+    if exclude_ids:
+        query = query.filter(~models.MovieRanking.movie_id.in_(exclude_ids))
+    return [row[0] for row in query.offset(skip).limit(limit).all()]
@@ -1,146 +1,809 @@
+import time
+import threading
+from contextlib import nullcontext
 import numpy as np
-from typing import List, Dict, Tuple
+import scipy.sparse as sp
+from scipy.sparse.linalg import svds
+from typing import List, Dict, NamedTuple, Optional, Tuple
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
 
 from app import models
+from app.core.config import settings
+from app.database.session import SessionLocal
+from app.services import model_store
+from app.services.catalog import get_genre_index, rank_by_genre_overlap, refresh_genre_index, refresh_title_index
+from app.services.ranking import get_popular_movie_ids, refresh_movie_rankings
 
 # Configuração do logger
 logger = logging.getLogger("app.recommendation")
 
-# Cache para evitar recalcular as matrizes frequentemente
-user_item_matrix_cache = None
-item_similarity_matrix_cache = None
-last_update_timestamp = 0
+# Acima desta fração de filmes afetados, a atualização incremental não compensa
+INCREMENTAL_MAX_AFFECTED_FRACTION = 0.05
 
-def _build_user_item_matrix(db: Session) -> Tuple[pd.DataFrame, Dict[int, int], Dict[int, int]]:
+class ItemNeighborIndex(NamedTuple):
     """
-    Constrói a matriz de usuários x filmes para calcular recomendações
+    Índice com os K vizinhos mais similares de cada filme.
+
+    `neighbors` e `scores` têm formato (n_filmes, K) e ficam ordenados por
+    similaridade decrescente. `weights` é uma visão CSR sobre os mesmos arrays,
+    usada para pontuar usuários com um produto esparso. `norms` guarda a norma
+    de cada filme, necessária para as atualizações incrementais.
+    """
+    neighbors: np.ndarray
+    scores: np.ndarray
+    weights: sp.csr_matrix
+    norms: np.ndarray
+
+class MatrixFactors(NamedTuple):
+    """
+    Fatores latentes do motor de fatoração de matrizes (SVD truncada).
+
+    `user_factors` (n_usuários x F) já inclui os valores singulares, então a nota
+    prevista de um usuário para todos os filmes é `item_factors @ user_factors[u]`.
+    """
+    user_factors: np.ndarray
+    item_factors: np.ndarray
+    item_norms: np.ndarray
+
+class RecommendationModel(NamedTuple):
+    """
+    Snapshot imutável do modelo de recomendação.
+
+    Todas as estruturas de um snapshot foram construídas juntas, então quem lê
+    uma referência ao snapshot nunca vê uma matriz nova com mapeamentos antigos.
+    `engine` indica qual estrutura está preenchida: `index` (item_knn) ou
+    `factors` (mf). `last_rating_id` é o maior Rating.id incorporado, `built_at`
+    o instante da última reconstrução completa e `version` identifica os dados
+    de avaliações e o motor (e o nome do artefato em disco).
+    """
+    matrix: sp.csr_matrix
+    user_to_idx: Dict[int, int]
+    idx_to_movie: Dict[int, int]
+    movie_to_idx: Dict[int, int]
+    user_means: np.ndarray
+    engine: str
+    index: Optional[ItemNeighborIndex]
+    factors: Optional[MatrixFactors]
+    last_rating_id: int
+    built_at: float
+    version: str
+
+
+# Snapshot publicado; substituído por inteiro com uma única atribuição
+_current_model: Optional[RecommendationModel] = None
+
+# Garante que apenas um modelo seja construído por vez
+_refresh_lock = threading.Lock()
+
+# Atualizador em segundo plano
+_refresh_requested = threading.Event()
+_refresher_thread: Optional[threading.Thread] = None
+_refresher_lock = threading.Lock()
+
+def _matrix_from_ratings(df: pd.DataFrame) -> Tuple[sp.csr_matrix, Dict[int, int], Dict[int, int], np.ndarray]:
+    """
+    Monta a matriz esparsa (CSR) centralizada a partir de um DataFrame com as
+    colunas user_id, movie_id e rating. Retorna também a média de cada usuário.
+    """
+    # Manter a última avaliação de cada par usuário/filme
+    df = df.drop_duplicates(subset=['user_id', 'movie_id'], keep='last')
+
+    # Códigos contíguos para usuários e filmes (na ordem de aparição)
+    user_codes, unique_user_ids = pd.factorize(df['user_id'])
+    movie_codes, unique_movie_ids = pd.factorize(df['movie_id'])
+    values = df['rating'].to_numpy(dtype=np.float64)
+
+    user_to_idx = {int(user_id): idx for idx, user_id in enumerate(unique_user_ids)}
+    idx_to_movie = {idx: int(movie_id) for idx, movie_id in enumerate(unique_movie_ids)}
+
+    # Normalizar as avaliações (subtrair a média de cada usuário) direto nas colunas
+    n_users, n_movies = len(unique_user_ids), len(unique_movie_ids)
+    counts = np.bincount(user_codes, minlength=n_users)
+    sums = np.bincount(user_codes, weights=values, minlength=n_users)
+    user_means = sums / np.maximum(counts, 1)
+    normalized = values - user_means[user_codes]
+
+    # Zeros explícitos são preservados: uma nota igual à média continua "avaliada"
+    normalized_matrix = sp.csr_matrix(
+        (normalized, (user_codes, movie_codes)),
+        shape=(n_users, n_movies)
+    )
+
+    return normalized_matrix, user_to_idx, idx_to_movie, user_means
+
+def _build_user_item_matrix(
+    db: Session,
+    max_rating_id: Optional[int] = None
+) -> Tuple[sp.csr_matrix, Dict[int, int], Dict[int, int], np.ndarray]:
+    """
+    Constrói a matriz esparsa (CSR) de usuários x filmes para calcular recomendações.
+
+    A matriz é montada de uma só vez a partir das colunas de avaliações e já sai
+    centralizada pela média de cada usuário, sem nunca ser densificada. Memória e
+    tempo crescem com o número de avaliações, não com usuários x filmes.
     """
     try:
-        # Obter todas as avaliações
-        ratings = db.query(
+        # Obter todas as avaliações (até o watermark, se informado)
+        query = db.query(
             models.Rating.user_id,
             models.Rating.movie_id,
             models.Rating.rating
-        ).all()
+        )
+        if max_rating_id is not None:
+            query = query.filter(models.Rating.id <= max_rating_id)
+
+        df = pd.DataFrame(query.order_by(models.Rating.id).all(), columns=['user_id', 'movie_id', 'rating'])
+        return _matrix_from_ratings(df)
+    except Exception as e:
+        logger.error(f"Erro ao construir matriz usuário-item: {e}")
+        # Retornar valores vazios em caso de erro
+        return sp.csr_matrix((0, 0)), {}, {}, np.zeros(0)
+
+def _neighbor_weights(neighbors: np.ndarray, scores: np.ndarray) -> sp.csr_matrix:
+    """
+    Monta a matriz CSR (n_filmes x n_filmes) que compartilha memória com os
+    arrays de vizinhos: a linha i contém as K similaridades do filme i.
+    """
+    n_items, k = neighbors.shape
+    indptr = np.arange(0, n_items * k + 1, k, dtype=np.int64)
+    return sp.csr_matrix(
+        (scores.reshape(-1), neighbors.reshape(-1), indptr),
+        shape=(n_items, n_items)
+    )
+
+def _item_norms(item_matrix: sp.csr_matrix) -> np.ndarray:
+    """
+    Norma euclidiana de cada linha (filme) da matriz filme x usuário.
+    """
+    return np.sqrt(np.asarray(item_matrix.multiply(item_matrix).sum(axis=1)).ravel())
+
+def _safe_norms(norms: np.ndarray) -> np.ndarray:
+    """
+    Substitui normas nulas por 1 para evitar divisão por zero.
+    """
+    return np.where(norms == 0, 1.0, norms)
+
+def _build_item_neighbors(
+    matrix: sp.csr_matrix,
+    k: Optional[int] = None,
+    block_size: Optional[int] = None
+) -> ItemNeighborIndex:
+    """
+    Calcula a similaridade de cosseno entre os filmes em blocos de linhas e
+    mantém apenas os K vizinhos mais similares de cada filme.
+
+    Cada bloco gera uma matriz densa de block_size x n_filmes que é descartada
+    logo após a seleção dos vizinhos, então a memória fica em O(n_filmes * K).
+    """
+    k = settings.RECOMMENDER_NEIGHBORS if k is None else k
+    block_size = settings.RECOMMENDER_BLOCK_SIZE if block_size is None else block_size
 
-        # Converter para DataFrame
-        df = pd.DataFrame(ratings, columns=['user_id', 'movie_id', 'rating'])
+    try:
+        # Transpor a matriz para calcular similaridade entre filmes (não usuários)
+        item_matrix = matrix.T.tocsr()
+        n_items = item_matrix.shape[0]
+        k = max(min(k, n_items - 1), 0)
 
-        # Criar mapeamentos para IDs de usuários e filmes
-        unique_user_ids = df['user_id'].unique()
-        unique_movie_ids = df['movie_id'].unique()
+        # Normalizar cada filme pela sua norma para que o produto escalar seja o cosseno
+        norms = _item_norms(item_matrix)
+        normalized = sp.diags(1.0 / _safe_norms(norms)).dot(item_matrix).tocsr()
+        normalized_t = normalized.T.tocsc()
 
-        user_to_idx = {user_id: idx for idx, user_id in enumerate(unique_user_ids)}
-        movie_to_idx = {movie_id: idx for idx, movie_id in enumerate(unique_movie_ids)}
-        idx_to_movie = {idx: movie_id for movie_id, idx in movie_to_idx.items()}
+        neighbors = np.zeros((n_items, k), dtype=np.int32)
+        scores = np.zeros((n_items, k), dtype=np.float32)
 
-        # Criar matriz esparsa para usuários x filmes
-        matrix = np.zeros((len(unique_user_ids), len(unique_movie_ids)))
+        if k > 0:
+            for start in range(0, n_items, block_size):
+                stop = min(start + block_size, n_items)
+                block = (normalized[start:stop] @ normalized_t).toarray()
 
-        for _, row in df.iterrows():
-            user_idx = user_to_idx[row['user_id']]
-            movie_idx = movie_to_idx[row['movie_id']]
-            matrix[user_idx, movie_idx] = row['rating']
+                # Excluir o próprio filme da sua lista de vizinhos
+                block[np.arange(stop - start), np.arange(start, stop)] = -np.inf
 
-        # Normalizar as avaliações (subtrair a média de cada usuário)
-        user_means = np.true_divide(matrix.sum(1), (matrix != 0).sum(1))
-        normalized_matrix = matrix.copy()
+                top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+                top_scores = np.take_along_axis(block, top, axis=1)
+                order = np.argsort(-top_scores, axis=1, kind='stable')
 
-        for i in range(matrix.shape[0]):
-            normalized_matrix[i, matrix[i] != 0] -= user_means[i]
+                neighbors[start:stop] = np.take_along_axis(top, order, axis=1)
+                scores[start:stop] = np.take_along_axis(top_scores, order, axis=1)
 
-        return normalized_matrix, user_to_idx, idx_to_movie
+        return ItemNeighborIndex(neighbors, scores, _neighbor_weights(neighbors, scores), norms)
     except Exception as e:
-        logger.error(f"Erro ao construir matriz usuário-item: {e}")
-        # Retornar valores vazios em caso de erro
-        return np.array([]), {}, {}
+        logger.error(f"Erro ao calcular vizinhos entre itens: {e}")
+        neighbors = np.zeros((0, 0), dtype=np.int32)
+        scores = np.zeros((0, 0), dtype=np.float32)
+        return ItemNeighborIndex(neighbors, scores, _neighbor_weights(neighbors, scores), np.zeros(0))
+
+def _apply_rating_delta(
+    matrix: sp.csr_matrix,
+    user_to_idx: Dict[int, int],
+    idx_to_movie: Dict[int, int],
+    user_means: np.ndarray,
+    delta: pd.DataFrame
+) -> Tuple[sp.csr_matrix, Dict[int, int], Dict[int, int], np.ndarray, np.ndarray]:
+    """
+    Incorpora novas avaliações à matriz centralizada sem reconstruí-la do banco.
 
-def _calculate_item_similarity(matrix: np.ndarray) -> np.ndarray:
+    As médias de usuários já conhecidos ficam congeladas até a próxima
+    reconstrução completa; assim só as colunas dos filmes avaliados mudam.
+    Retorna as novas estruturas e os índices dos filmes afetados.
     """
-    Calcula a matriz de similaridade entre os filmes
+    delta = delta.drop_duplicates(subset=['user_id', 'movie_id'], keep='last')
+    user_to_idx = dict(user_to_idx)
+    idx_to_movie = dict(idx_to_movie)
+    movie_to_idx = {movie_id: idx for idx, movie_id in idx_to_movie.items()}
+    n_known_users = len(user_to_idx)
+
+    # Registrar usuários e filmes novos ao final dos índices existentes
+    for user_id in pd.unique(delta['user_id']):
+        user_to_idx.setdefault(int(user_id), len(user_to_idx))
+    for movie_id in pd.unique(delta['movie_id']):
+        if int(movie_id) not in movie_to_idx:
+            movie_to_idx[int(movie_id)] = len(idx_to_movie)
+            idx_to_movie[len(idx_to_movie)] = int(movie_id)
+
+    n_users, n_movies = len(user_to_idx), len(idx_to_movie)
+    user_codes = delta['user_id'].map(user_to_idx).to_numpy(dtype=np.int64)
+    movie_codes = delta['movie_id'].map(movie_to_idx).to_numpy(dtype=np.int64)
+    values = delta['rating'].to_numpy(dtype=np.float64)
+
+    # Usuários novos recebem a média das suas próprias avaliações
+    user_means = np.concatenate([user_means, np.zeros(n_users - n_known_users)])
+    new_users = user_codes >= n_known_users
+    if new_users.any():
+        counts = np.bincount(user_codes[new_users], minlength=n_users)
+        sums = np.bincount(user_codes[new_users], weights=values[new_users], minlength=n_users)
+        user_means[n_known_users:] = sums[n_known_users:] / np.maximum(counts[n_known_users:], 1)
+
+    # Juntar as entradas antigas e novas, mantendo a última de cada par usuário/filme
+    coo = matrix.tocoo()
+    rows = np.concatenate([coo.row.astype(np.int64), user_codes])
+    cols = np.concatenate([coo.col.astype(np.int64), movie_codes])
+    data = np.concatenate([coo.data, values - user_means[user_codes]])
+    keys = rows * n_movies + cols
+    _, last_reversed = np.unique(keys[::-1], return_index=True)
+    keep = keys.shape[0] - 1 - last_reversed
+
+    matrix = sp.csr_matrix((data[keep], (rows[keep], cols[keep])), shape=(n_users, n_movies))
+    return matrix, user_to_idx, idx_to_movie, user_means, np.unique(movie_codes)
+
+def _update_item_neighbors(
+    matrix: sp.csr_matrix,
+    index: ItemNeighborIndex,
+    affected: np.ndarray,
+    block_size: Optional[int] = None
+) -> ItemNeighborIndex:
     """
-    try:
-        # Transpor a matriz para calcular similaridade entre filmes (não usuários)
-        item_matrix = matrix.T
+    Atualiza o índice de vizinhos apenas nas linhas e colunas dos filmes afetados.
 
-        # Substituir NaN por 0 (após a transposição)
-        item_matrix = np.nan_to_num(item_matrix)
+    As normas e os produtos escalares dos filmes afetados são recalculados contra
+    todo o catálogo. As linhas afetadas recebem seus K vizinhos exatos; nas demais
+    linhas a similaridade com um filme afetado é atualizada ou entra no lugar do
+    pior vizinho. O índice anterior não é modificado.
+    """
+    block_size = settings.RECOMMENDER_BLOCK_SIZE if block_size is None else block_size
+
+    item_matrix = matrix.T.tocsr()
+    n_items = item_matrix.shape[0]
+    n_known, k = index.neighbors.shape
+
+    # Copiar os arrays e abrir espaço para filmes novos
+    neighbors = np.zeros((n_items, k), dtype=np.int32)
+    scores = np.full((n_items, k), -np.inf, dtype=np.float32)
+    neighbors[:n_known] = index.neighbors
+    scores[:n_known] = index.scores
+    norms = np.zeros(n_items)
+    norms[:n_known] = index.norms
+    norms[affected] = _item_norms(item_matrix[affected])
+    safe = _safe_norms(norms)
+
+    for start in range(0, affected.shape[0], block_size):
+        block_items = affected[start:start + block_size]
+
+        # Produtos escalares dos filmes afetados contra todo o catálogo
+        dots = (item_matrix[block_items] @ item_matrix.T).toarray()
+        similarity = dots / safe[block_items][:, None] / safe[None, :]
+        similarity[np.arange(block_items.shape[0]), block_items] = -np.inf
+
+        # Colunas: atualizar a similaridade com o filme afetado nas outras listas
+        for item, column in zip(block_items, similarity.astype(np.float32)):
+            rows, positions = np.nonzero(neighbors == item)
+            scores[rows, positions] = column[rows]
+
+            present = np.zeros(n_items, dtype=bool)
+            present[rows] = True
+            present[item] = True
+            entering = np.flatnonzero(~present & (column > scores[:, -1]))
+            neighbors[entering, -1] = item
+            scores[entering, -1] = column[entering]
+
+            touched = np.union1d(rows, entering)
+            order = np.argsort(-scores[touched], axis=1, kind='stable')
+            neighbors[touched] = np.take_along_axis(neighbors[touched], order, axis=1)
+            scores[touched] = np.take_along_axis(scores[touched], order, axis=1)
+
+        # Linhas: os K vizinhos exatos de cada filme afetado
+        top = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarity, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        neighbors[block_items] = np.take_along_axis(top, order, axis=1)
+        scores[block_items] = np.take_along_axis(top_scores, order, axis=1)
+
+    return ItemNeighborIndex(neighbors, scores, _neighbor_weights(neighbors, scores), norms)
+
+def _build_matrix_factors(matrix: sp.csr_matrix, n_factors: Optional[int] = None) -> MatrixFactors:
+    """
+    Aprende fatores de baixo posto para usuários e filmes com SVD truncada da
+    matriz esparsa centralizada. A memória do modelo é O((usuários + filmes) * F).
+    """
+    n_factors = settings.RECOMMENDER_FACTORS if n_factors is None else n_factors
+    n_factors = max(min(n_factors, min(matrix.shape) - 1), 0)
+
+    if n_factors == 0:
+        return MatrixFactors(
+            np.zeros((matrix.shape[0], 0), dtype=np.float32),
+            np.zeros((matrix.shape[1], 0), dtype=np.float32),
+            np.zeros(matrix.shape[1], dtype=np.float32)
+        )
+
+    u, sigma, vt = svds(matrix.astype(np.float64), k=n_factors, random_state=0)
 
-        # Calcular similaridade de cosseno entre os filmes
-        similarity = cosine_similarity(item_matrix)
+    # svds não garante a ordem dos valores singulares
+    order = np.argsort(-sigma)
+    user_factors = np.ascontiguousarray((u[:, order] * sigma[order]).astype(np.float32))
+    item_factors = np.ascontiguousarray(vt[order].T.astype(np.float32))
 
-        # Definir a diagonal principal como 0 para evitar recomendar o mesmo filme
-        np.fill_diagonal(similarity, 0)
+    return MatrixFactors(user_factors, item_factors, np.linalg.norm(item_factors, axis=1))
+
+def _engine_tag() -> str:
+    """
+    Identifica o motor configurado e seu tamanho, para compor a versão do modelo.
+    """
+    if settings.RECOMMENDER_ENGINE == "mf":
+        return f"mf{settings.RECOMMENDER_FACTORS}"
+    return f"knn{settings.RECOMMENDER_NEIGHBORS}"
 
-        return similarity
+def _ratings_version(db: Session) -> Tuple[int, str]:
+    """
+    Identifica o estado atual das avaliações (maior id, total de linhas e
+    checksum do trecho de ratings.csv importado pelo ETL) junto com o motor
+    configurado. Retorna o maior id e a versão.
+    """
+    latest_rating_id, rating_count = db.query(
+        func.max(models.Rating.id), func.count(models.Rating.id)
+    ).one()
+    latest_rating_id = latest_rating_id or 0
+
+    # Uma recarga forçada de um ratings.csv editado reaproveita os ids (o SQLite
+    # reusa os rowids da tabela esvaziada) e pode repetir maior id e total
+    checksum = db.query(models.EtlFileState.checksum).filter(
+        models.EtlFileState.file_name == "ratings.csv"
+    ).scalar()
+    content = f"-c{checksum[:12]}" if checksum else ""
+    return latest_rating_id, f"r{latest_rating_id}-n{rating_count}{content}-{_engine_tag()}"
+
+def _build_model(db: Session, latest_rating_id: int, version: str) -> RecommendationModel:
+    """
+    Constrói do zero um snapshot com a matriz usuário-item e a estrutura do
+    motor configurado (índice de vizinhos ou fatores latentes).
+    """
+    user_item_matrix, user_to_idx, idx_to_movie, user_means = _build_user_item_matrix(db, latest_rating_id)
+
+    engine = settings.RECOMMENDER_ENGINE
+    neighbor_index = _build_item_neighbors(user_item_matrix) if engine == "item_knn" else None
+    factors = _build_matrix_factors(user_item_matrix) if engine == "mf" else None
+
+    logger.info(f"Modelo de recomendação reconstruído até a avaliação {latest_rating_id}")
+    return RecommendationModel(
+        matrix=user_item_matrix,
+        user_to_idx=user_to_idx,
+        idx_to_movie=idx_to_movie,
+        movie_to_idx={movie_id: idx for idx, movie_id in idx_to_movie.items()},
+        user_means=user_means,
+        engine=engine,
+        index=neighbor_index,
+        factors=factors,
+        last_rating_id=latest_rating_id,
+        built_at=time.time(),
+        version=version,
+    )
+
+def _update_model(
+    db: Session,
+    model: RecommendationModel,
+    latest_rating_id: int,
+    version: str
+) -> Optional[RecommendationModel]:
+    """
+    Gera um novo snapshot aplicando apenas as avaliações com id > model.last_rating_id.
+    Retorna None quando a atualização incremental não é viável.
+    """
+    # Só o índice de vizinhos é atualizado incrementalmente; os fatores são reaprendidos
+    if model.engine != "item_knn" or settings.RECOMMENDER_ENGINE != "item_knn":
+        return None
+
+    # Um índice com menos vizinhos que o configurado precisa ser recalculado por inteiro
+    if model.index.neighbors.shape[1] < settings.RECOMMENDER_NEIGHBORS:
+        return None
+
+    delta = pd.DataFrame(
+        db.query(models.Rating.user_id, models.Rating.movie_id, models.Rating.rating)
+        .filter(models.Rating.id > model.last_rating_id, models.Rating.id <= latest_rating_id)
+        .order_by(models.Rating.id)
+        .all(),
+        columns=['user_id', 'movie_id', 'rating']
+    )
+
+    user_item_matrix, user_to_idx, idx_to_movie, user_means, affected = _apply_rating_delta(
+        model.matrix, model.user_to_idx, model.idx_to_movie, model.user_means, delta
+    )
+    if affected.shape[0] > INCREMENTAL_MAX_AFFECTED_FRACTION * user_item_matrix.shape[1]:
+        return None
+
+    neighbor_index = _update_item_neighbors(user_item_matrix, model.index, affected)
+
+    logger.info(f"Modelo de recomendação atualizado com {len(delta)} avaliações ({affected.shape[0]} filmes afetados)")
+    return RecommendationModel(
+        matrix=user_item_matrix,
+        user_to_idx=user_to_idx,
+        idx_to_movie=idx_to_movie,
+        movie_to_idx={movie_id: idx for idx, movie_id in idx_to_movie.items()},
+        user_means=user_means,
+        engine=model.engine,
+        index=neighbor_index,
+        factors=None,
+        last_rating_id=latest_rating_id,
+        built_at=model.built_at,
+        version=version,
+    )
+
+def _save_model(model: RecommendationModel) -> None:
+    """
+    Grava o snapshot como artefato versionado (.npy) para ser reaproveitado por
+    outros workers e após reinícios.
+    """
+    if not settings.RECOMMENDER_ARTIFACT_DIR:
+        return
+
+    user_ids = np.zeros(len(model.user_to_idx), dtype=np.int64)
+    user_ids[list(model.user_to_idx.values())] = list(model.user_to_idx.keys())
+    movie_ids = np.zeros(len(model.idx_to_movie), dtype=np.int64)
+    movie_ids[list(model.idx_to_movie.keys())] = list(model.idx_to_movie.values())
+
+    arrays = {
+        "matrix_data": model.matrix.data,
+        "matrix_indices": model.matrix.indices,
+        "matrix_indptr": model.matrix.indptr,
+        "matrix_shape": np.array(model.matrix.shape, dtype=np.int64),
+        "user_ids": user_ids,
+        "movie_ids": movie_ids,
+        "user_means": model.user_means,
+    }
+    if model.index is not None:
+        arrays.update(neighbors=model.index.neighbors, scores=model.index.scores, norms=model.index.norms)
+    if model.factors is not None:
+        arrays.update(
+            user_factors=model.factors.user_factors,
+            item_factors=model.factors.item_factors,
+            item_norms=model.factors.item_norms,
+        )
+    metadata = {"last_rating_id": model.last_rating_id, "built_at": model.built_at, "engine": model.engine}
+
+    try:
+        model_store.save_artifact(settings.RECOMMENDER_ARTIFACT_DIR, model.version, arrays, metadata)
     except Exception as e:
-        logger.error(f"Erro ao calcular similaridade entre itens: {e}")
-        return np.array([])
+        logger.error(f"Erro ao gravar o artefato do modelo: {e}")
 
-def get_recommendations_for_user(db: Session, user_id: int, limit: int = 10) -> List[int]:
+def _load_model(version: str) -> Optional[RecommendationModel]:
     """
-    Gera recomendações de filmes para um usuário específico usando filtragem colaborativa
+    Carrega o artefato da versão informada com os arrays mapeados em memória
+    (mmap), ou retorna None se ele não existir.
+    """
+    if not settings.RECOMMENDER_ARTIFACT_DIR:
+        return None
+
+    try:
+        loaded = model_store.load_artifact(settings.RECOMMENDER_ARTIFACT_DIR, version)
+    except Exception as e:
+        logger.error(f"Erro ao carregar o artefato do modelo: {e}")
+        return None
+    if loaded is None:
+        return None
+
+    arrays, metadata = loaded
+    matrix = sp.csr_matrix(
+        (arrays["matrix_data"], arrays["matrix_indices"], arrays["matrix_indptr"]),
+        shape=tuple(int(n) for n in arrays["matrix_shape"])
+    )
+    idx_to_movie = {idx: movie_id for idx, movie_id in enumerate(arrays["movie_ids"].tolist())}
+
+    neighbor_index = None
+    if "neighbors" in arrays:
+        neighbors, scores = arrays["neighbors"], arrays["scores"]
+        neighbor_index = ItemNeighborIndex(neighbors, scores, _neighbor_weights(neighbors, scores), arrays["norms"])
+
+    factors = None
+    if "user_factors" in arrays:
+        factors = MatrixFactors(arrays["user_factors"], arrays["item_factors"], arrays["item_norms"])
+
+    logger.info(f"Modelo de recomendação carregado do artefato {version}")
+    return RecommendationModel(
+        matrix=matrix,
+        user_to_idx={user_id: idx for idx, user_id in enumerate(arrays["user_ids"].tolist())},
+        idx_to_movie=idx_to_movie,
+        movie_to_idx={movie_id: idx for idx, movie_id in idx_to_movie.items()},
+        user_means=arrays["user_means"],
+        engine=metadata["engine"],
+        index=neighbor_index,
+        factors=factors,
+        last_rating_id=metadata["last_rating_id"],
+        built_at=metadata["built_at"],
+        version=version,
+    )
+
+def _compute_model(
+    db: Session,
+    model: Optional[RecommendationModel],
+    latest_rating_id: int,
+    version: str,
+    full: bool
+) -> RecommendationModel:
     """
-    global user_item_matrix_cache, item_similarity_matrix_cache, last_update_timestamp
+    Calcula o próximo snapshot, incrementalmente quando possível.
+    """
+    if (model is None or full
+            or latest_rating_id <= model.last_rating_id
+            or not settings.RECOMMENDER_INCREMENTAL
+            or time.time() - model.built_at >= settings.RECOMMENDER_FULL_REBUILD_SECONDS):
+        return _build_model(db, latest_rating_id, version)
 
-    # Verificar se precisamos atualizar o cache
-    latest_rating_timestamp = db.query(func.max(models.Rating.timestamp)).scalar() or 0
-    if latest_rating_timestamp > last_update_timestamp or user_item_matrix_cache is None:
-        # Reconstruir as matrizes
-        user_item_matrix, user_to_idx, idx_to_movie = _build_user_item_matrix(db)
-        item_similarity_matrix = _calculate_item_similarity(user_item_matrix)
+    try:
+        new_model = _update_model(db, model, latest_rating_id, version)
+    except Exception as e:
+        logger.error(f"Erro na atualização incremental do modelo: {e}")
+        new_model = None
 
-        # Atualizar o cache
-        user_item_matrix_cache = (user_item_matrix, user_to_idx, idx_to_movie)
-        item_similarity_matrix_cache = item_similarity_matrix
-        last_update_timestamp = latest_rating_timestamp
-    else:
-        # Usar o cache
-        user_item_matrix, user_to_idx, idx_to_movie = user_item_matrix_cache
-        item_similarity_matrix = item_similarity_matrix_cache
+    return new_model if new_model is not None else _build_model(db, latest_rating_id, version)
 
-    # Obter avaliações do usuário
+def get_model() -> Optional[RecommendationModel]:
+    """
+    Retorna o snapshot publicado (ou None se nenhum modelo foi construído ainda).
+    Nunca bloqueia: as requisições sempre leem a referência atual.
+    """
+    return _current_model
+
+def refresh_recommendation_model(db: Session, full: bool = False) -> Optional[RecommendationModel]:
+    """
+    Deixa o modelo em dia com as avaliações e publica o novo snapshot.
+
+    Se já existe em disco um artefato para a versão atual das avaliações, ele é
+    carregado via mmap em vez de recalculado. Caso contrário, novas avaliações
+    são aplicadas incrementalmente; a reconstrução completa só acontece no
+    primeiro uso, quando `full` é True, quando o modo incremental está desligado
+    ou quando o intervalo de reconstrução completa expirou.
+    """
+    global _current_model
+
+    with _refresh_lock:
+        model = _current_model
+        latest_rating_id, version = _ratings_version(db)
+
+        if not full and model is not None and model.version == version:
+            return model
+
+        # Outro worker (ou uma execução anterior) pode já ter gravado esta versão
+        new_model = None if full else _load_model(version)
+
+        if new_model is None:
+            artifact_lock = (
+                model_store.artifact_lock(settings.RECOMMENDER_ARTIFACT_DIR)
+                if settings.RECOMMENDER_ARTIFACT_DIR else nullcontext()
+            )
+            with artifact_lock:
+                # Conferir de novo após esperar pela trava de outro processo
+                new_model = None if full else _load_model(version)
+                if new_model is None:
+                    new_model = _compute_model(db, model, latest_rating_id, version, full)
+                    _save_model(new_model)
+
+        # Publicar o snapshot com uma única troca de referência
+        _current_model = new_model
+        return new_model
+
+def rebuild_recommendation_model(db: Session) -> Optional[RecommendationModel]:
+    """
+    Reconstrói do zero o modelo de recomendação sob demanda.
+    """
+    return refresh_recommendation_model(db, full=True)
+
+def _refresh_loop() -> None:
+    """
+    Laço do atualizador: acorda a cada RECOMMENDER_REFRESH_SECONDS ou quando
+    uma atualização é solicitada, e constrói o próximo snapshot fora das requisições.
+    """
+    while True:
+        _refresh_requested.wait(timeout=settings.RECOMMENDER_REFRESH_SECONDS)
+        _refresh_requested.clear()
+
+        db = SessionLocal()
+        try:
+            refresh_recommendation_model(db)
+            refresh_movie_rankings(db)
+            refresh_genre_index(db)
+            refresh_title_index(db)
+        except Exception as e:
+            logger.error(f"Erro ao atualizar o modelo de recomendação: {e}")
+        finally:
+            db.close()
+
+def start_model_refresher() -> None:
+    """
+    Inicia (uma única vez) a thread que mantém o modelo atualizado em segundo plano.
+    """
+    global _refresher_thread
+
+    with _refresher_lock:
+        if _refresher_thread is None or not _refresher_thread.is_alive():
+            _refresher_thread = threading.Thread(
+                target=_refresh_loop, name="recommendation-refresher", daemon=True
+            )
+            _refresher_thread.start()
+            logger.info("Atualizador do modelo de recomendação iniciado.")
+
+def request_model_refresh() -> None:
+    """
+    Pede ao atualizador em segundo plano que verifique novas avaliações agora.
+    """
+    start_model_refresher()
+    _refresh_requested.set()
+
+def warm_recommendation_model(full: bool = False) -> None:
+    """
+    Publica o modelo de forma síncrona (usado ao fim do ETL), reaproveitando o
+    artefato em disco quando a versão coincide com os dados. Com `full` (depois
+    de uma recarga forçada), reconstrói do zero.
+    """
+    db = SessionLocal()
     try:
-        user_idx = user_to_idx[user_id]
-    except KeyError:
-        # Usuário não encontrado na matriz, usar recomendações populares
-        top_movies = db.query(
-            models.Rating.movie_id,
-            func.avg(models.Rating.rating).label('avg_rating'),
-            func.count(models.Rating.id).label('rating_count')
-        ).group_by(models.Rating.movie_id).order_by(
-            func.avg(models.Rating.rating).desc(),
-            func.count(models.Rating.id).desc()
-        ).limit(limit).all()
+        refresh_recommendation_model(db, full=full)
+    except Exception as e:
+        logger.error(f"Erro ao aquecer o modelo de recomendação: {e}")
+    finally:
+        db.close()
 
-        return [movie[0] for movie in top_movies]
+def _score_items(user_row: sp.csr_matrix, weights: sp.csr_matrix) -> np.ndarray:
+    """
+    Calcula a pontuação de todos os filmes para um usuário: soma das notas
+    centralizadas do usuário ponderadas pela similaridade com cada vizinho.
+    """
+    return (user_row @ weights).toarray().ravel().astype(np.float64)
 
-    # Filmes que o usuário já avaliou
-    user_ratings = user_item_matrix[user_idx]
-    rated_items = np.where(user_ratings != 0)[0]
+def _score_user(model: RecommendationModel, user_idx: int) -> np.ndarray:
+    """
+    Pontua todos os filmes para um usuário com o motor do snapshot.
+    """
+    if model.factors is not None:
+        factors = model.factors
+        return (factors.item_factors @ factors.user_factors[user_idx]).astype(np.float64)
+    return _score_items(model.matrix.getrow(user_idx), model.index.weights)
 
-    # Calcular pontuações de recomendação
-    recommendation_scores = np.zeros(user_ratings.shape)
+def _similar_item_indices(model: RecommendationModel, movie_idx: int, k: int) -> np.ndarray:
+    """
+    Retorna os índices dos k filmes mais similares, em ordem decrescente.
+    No motor mf a similaridade é o cosseno entre os fatores dos filmes.
+    """
+    if model.factors is not None:
+        factors = model.factors
+        norms = _safe_norms(factors.item_norms)
+        similarity = (factors.item_factors @ factors.item_factors[movie_idx]) / (norms * norms[movie_idx])
+        similarity = similarity.astype(np.float64)
+        similarity[movie_idx] = -np.inf
+        return _top_k_indices(similarity, k)
+    return model.index.neighbors[movie_idx][:k]
+
+def _top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Retorna os índices das k maiores pontuações finitas, em ordem decrescente.
+    Usa argpartition para evitar ordenar o catálogo inteiro.
+    """
+    candidates = np.flatnonzero(np.isfinite(scores))
+    k = min(k, candidates.shape[0])
+    if k <= 0:
+        return np.array([], dtype=np.intp)
+
+    if k < candidates.shape[0]:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
 
-    for item_idx in range(user_ratings.shape[0]):
-        # Pular filmes que o usuário já avaliou
-        if item_idx in rated_items:
-            continue
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
 
-        # Calcular a pontuação de predição
-        for rated_item in rated_items:
-            recommendation_scores[item_idx] += user_ratings[rated_item] * item_similarity_matrix[rated_item, item_idx]
+def recommend_for_user_block(model: RecommendationModel, user_indices: np.ndarray, n: int) -> List[List[int]]:
+    """
+    Pontua um bloco de usuários de uma vez (produto esparso matriz-matriz, ou
+    produto com os fatores no motor mf) e retorna os n melhores filmes de cada
+    um, já convertidos para IDs de filmes. Usado na pré-computação em lote.
+    """
+    block = model.matrix[user_indices]
+    if model.factors is not None:
+        scores = (model.factors.user_factors[user_indices] @ model.factors.item_factors.T).astype(np.float64)
+    else:
+        scores = (block @ model.index.weights).toarray().astype(np.float64)
+
+    # Descartar os filmes que cada usuário já avaliou
+    rated_rows = np.repeat(np.arange(block.shape[0]), np.diff(block.indptr))
+    scores[rated_rows, block.indices] = -np.inf
+
+    n = min(n, scores.shape[1])
+    if n <= 0:
+        return [[] for _ in range(block.shape[0])]
+
+    top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1, kind='stable')
+    top = np.take_along_axis(top, order, axis=1)
+    top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+    return [
+        [model.idx_to_movie[idx] for idx in row[np.isfinite(row_scores)].tolist()]
+        for row, row_scores in zip(top, top_scores)
+    ]
+
+def get_precomputed_recommendations(
+    db: Session, user_id: int, rating_count: int, limit: int = 10
+) -> Optional[List[int]]:
+    """
+    Retorna as recomendações pré-calculadas do usuário, ou None se não existirem,
+    forem mais curtas que `limit` ou se as avaliações do usuário mudaram desde o
+    lote: outra contagem (`rating_count` é a atual) ou avaliações mais novas.
+    """
+    precomputed = db.query(models.UserRecommendation).filter(
+        models.UserRecommendation.user_id == user_id
+    ).first()
+    if (
+        precomputed is None
+        or len(precomputed.movie_ids) < limit
+        or precomputed.rating_count != rating_count
+    ):
+        return None
+
+    changed_after_batch = db.query(models.Rating.id).filter(
+        models.Rating.user_id == user_id,
+        models.Rating.id > precomputed.last_rating_id
+    ).first()
+    if changed_after_batch:
+        return None
+
+    return precomputed.movie_ids[:limit]
+
+def get_recommendations_for_user(db: Session, user_id: int, limit: int = 10) -> List[int]:
+    """
+    Gera recomendações de filmes para um usuário específico usando filtragem colaborativa
+    """
+    model = get_model()
+    if model is None:
+        # Modelo ainda não construído: pedir ao atualizador sem bloquear a requisição
+        request_model_refresh()
+
+    # Obter avaliações do usuário
+    user_idx = model.user_to_idx.get(user_id) if model is not None else None
+    if user_idx is None:
+        # Usuário (ou modelo) não encontrado, usar recomendações populares
+        return get_popular_movie_ids(db, limit)
+
+    # Filmes que o usuário já avaliou
+    rated_items = model.matrix.getrow(user_idx).indices
+
+    # Pontuar todos os filmes com um único produto matriz-vetor e descartar os já avaliados
+    recommendation_scores = _score_user(model, user_idx)
+    recommendation_scores[rated_items] = -np.inf
 
     # Obter os índices dos filmes com maiores pontuações
-    top_item_indices = np.argsort(recommendation_scores)[::-1][:limit]
+    top_item_indices = _top_k_indices(recommendation_scores, limit)
 
     # Converter índices de volta para IDs de filmes
-    recommended_movie_ids = [idx_to_movie[idx] for idx in top_item_indices]
+    recommended_movie_ids = [model.idx_to_movie[idx] for idx in top_item_indices]
 
     return recommended_movie_ids
 
@@ -165,66 +828,35 @@ def get_similar_movies(db: Session, movie_id: int, limit: int = 10) -> List[int]
             # Obter gêneros do filme
             genre_ids = [genre.id for genre in movie.genres]
 
-            # Encontrar filmes com gêneros semelhantes
-            similar_genre_movies = (
-                db.query(models.Movie)
-                .join(models.movie_genre)
-                .filter(models.movie_genre.c.genre_id.in_(genre_ids))
-                .filter(models.Movie.id != db_movie_id)  # Excluir o próprio filme
-                .group_by(models.Movie.id)
-                .order_by(func.count().desc())  # Ordenar por número de gêneros em comum
-                .limit(limit * 2)  # Buscar mais para depois combinar
-            ).all()
-
-            content_based_ids = [m.id for m in similar_genre_movies]
-
-        # Filtragem colaborativa - usando a matriz de similaridade
-        global user_item_matrix_cache, item_similarity_matrix_cache, last_update_timestamp
-
-        # Verificar se precisamos atualizar o cache
-        latest_rating_timestamp = db.query(func.max(models.Rating.timestamp)).scalar() or 0
-        if latest_rating_timestamp > last_update_timestamp or user_item_matrix_cache is None:
-            # Reconstruir as matrizes
-            user_item_matrix, user_to_idx, idx_to_movie = _build_user_item_matrix(db)
-            item_similarity_matrix = _calculate_item_similarity(user_item_matrix)
-
-            # Atualizar o cache
-            user_item_matrix_cache = (user_item_matrix, user_to_idx, idx_to_movie)
-            item_similarity_matrix_cache = item_similarity_matrix
-            last_update_timestamp = latest_rating_timestamp
-        else:
-            # Usar o cache
-            user_item_matrix, _, idx_to_movie = user_item_matrix_cache
-            item_similarity_matrix = item_similarity_matrix_cache
-
-        # Mapear movie_id para o índice na matriz
-        movie_to_idx = {v: k for k, v in idx_to_movie.items()}
-
-        if db_movie_id not in movie_to_idx:
+            # Encontrar filmes com gêneros semelhantes (excluindo o próprio filme) no índice
+            # de gêneros, buscando mais para depois combinar
+            content_based_ids = rank_by_genre_overlap(
+                get_genre_index(db), genre_ids, limit * 2, exclude_ids=[db_movie_id]
+            )
+
+        # Filtragem colaborativa - usando o snapshot publicado do modelo
+        model = get_model()
+        if model is None:
+            request_model_refresh()
+
+        if model is None or db_movie_id not in model.movie_to_idx:
             logger.warning(f"Filme id={db_movie_id} não encontrado na matriz de similaridade")
             # Se não tivermos dados de similaridade, retornar apenas os filmes do mesmo gênero
-            top_similar_movies = (
-                db.query(models.Rating.movie_id)
-                .group_by(models.Rating.movie_id)
-                .order_by(func.avg(models.Rating.rating).desc())
-                .limit(limit)
-            ).all()
-
             if content_based_ids:
                 # Usar uma mistura de populares e baseados em conteúdo
                 return content_based_ids[:limit]
             else:
                 # Usar apenas filmes populares
-                return [movie[0] for movie in top_similar_movies]
+                return get_popular_movie_ids(db, limit, exclude_ids=[db_movie_id])
 
         # CORREÇÃO: Usar o ID interno do banco para obter o índice na matriz
-        movie_idx = movie_to_idx[db_movie_id]
+        movie_idx = model.movie_to_idx[db_movie_id]
 
-        # Obter os índices dos filmes mais similares
-        similar_movie_indices = np.argsort(item_similarity_matrix[movie_idx])[::-1][:limit * 2]
+        # Índices dos filmes mais similares, já em ordem decrescente
+        similar_movie_indices = _similar_item_indices(model, movie_idx, limit * 2)
 
         # Converter índices de volta para IDs de filmes
-        collaborative_similar_ids = [idx_to_movie[idx] for idx in similar_movie_indices]
+        collaborative_similar_ids = [model.idx_to_movie[idx] for idx in similar_movie_indices]
 
         # Combinar as duas abordagens (filtragem colaborativa e baseada em conteúdo)
         combined_results = []
@@ -248,13 +880,4 @@ def get_similar_movies(db: Session, movie_id: int, limit: int = 10) -> List[int]
     except Exception as e:
         logger.error(f"Erro ao obter filmes similares: {e}")
         # Retornar filmes populares em caso de erro
-        top_movies = db.query(
-            models.Rating.movie_id,
-            func.avg(models.Rating.rating).label('avg_rating'),
-            func.count(models.Rating.id).label('rating_count')
-        ).group_by(models.Rating.movie_id).order_by(
-            func.avg(models.Rating.rating).desc(),
-            func.count(models.Rating.id).desc()
-        ).limit(limit).all()
-
-        return [movie[0] for movie in top_movies]
\ No newline at end of file
+        return get_popular_movie_ids(db, limit)
\ No newline at end of file
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Hashable, NamedTuple, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.services.catalog import catalog_version
+from app.services.ranking import rankings_version
+
+# Configuração do logger
+logger = logging.getLogger("app.response_cache")
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+class ResponseCache:
+    """
+    Cache LRU de respostas já serializadas, limitado pelo total de bytes.
+    As chaves incluem a versão dos dados, então entradas antigas deixam de ser
+    encontradas quando os dados mudam e saem pela ordem LRU.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous.body)
+            self._entries[key] = entry
+            self._size += len(entry.body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_BYTES)
+
+# Um TypeAdapter por response_model, reaproveitado entre requisições
+_adapters: dict = {}
+
+def data_version() -> Optional[Tuple[Any, ...]]:
+    """
+    Versão global dos dados servidos pelos endpoints de filmes: estado das
+    avaliações (movie_rankings) e do catálogo (movies/movie_genre). None até que
+    ambos tenham sido carregados neste processo.
+    """
+    ratings, catalog = rankings_version(), catalog_version()
+    if ratings is None or catalog is None:
+        return None
+    return ratings, catalog
+
+def _request_key(request: Request) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """Rota e parâmetros normalizados (ordem dos parâmetros não importa)."""
+    return request.url.path, tuple(sorted(request.query_params.multi_items()))
+
+def _not_modified(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def _json_response(request: Request, entry: CachedResponse) -> Response:
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age={settings.RESPONSE_CACHE_MAX_AGE}",
+    }
+    if _not_modified(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def cached_response(request: Request) -> Optional[Response]:
+    """
+    Resposta guardada para a rota, os parâmetros e a versão atual dos dados
+    (304 se o cliente já tem o mesmo ETag), ou None se for preciso calculá-la.
+    A versão consultada fica na requisição para que cache_response guarde a
+    resposta sob ela, mesmo que os dados mudem durante o cálculo.
+    """
+    version = data_version()
+    request.state.data_version = version
+    if version is None:
+        return None
+    entry = response_cache.get((_request_key(request), version))
+    return _json_response(request, entry) if entry is not None else None
+
+def cache_response(request: Request, response_model: Any, content: Any) -> Response:
+    """
+    Serializa `content` segundo `response_model`, guarda o resultado no cache
+    sob a versão dos dados consultada em cached_response e o envia com ETag e
+    Cache-Control.
+    """
+    adapter = _adapters.get(response_model)
+    if adapter is None:
+        adapter = _adapters.setdefault(response_model, TypeAdapter(response_model))
+    return cache_body(request, adapter.dump_json(adapter.validate_python(content, from_attributes=True)))
+
+def cache_body(request: Request, body: bytes) -> Response:
+    """Como cache_response, para um corpo JSON já serializado."""
+    entry = CachedResponse(body=body, etag=f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+
+    version = getattr(request.state, "data_version", None)
+    if version is not None and settings.RESPONSE_CACHE_MAX_BYTES > 0:
+        response_cache.put((_request_key(request), version), entry)
+    return _json_response(request, entry)
@@ -0,0 +1,99 @@
+import re
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Select, column, table, text
+from sqlalchemy.engine import Engine
+
+from app import models
+
+# Configuração do logger
+logger = logging.getLogger("app.search")
+
+# Tabela virtual FTS5 sobre movies.title (conteúdo externo: só o índice é armazenado)
+TITLE_FTS_TABLE = "movie_titles_fts"
+
+title_fts = table(TITLE_FTS_TABLE, column("rowid"), column("title"), column("rank"))
+
+_TITLE_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TITLE_FTS_TABLE} USING fts5(
+        title, content='movies', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    # Gatilhos mantêm o índice sincronizado com qualquer escrita em movies (ETL incluído)
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_title_fts_ai AFTER INSERT ON movies BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_title_fts_ad AFTER DELETE ON movies BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS movies_title_fts_au AFTER UPDATE OF title ON movies BEGIN
+        INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}, rowid, title) VALUES ('delete', old.id, old.title);
+        INSERT INTO {TITLE_FTS_TABLE}(rowid, title) VALUES (new.id, new.title);
+    END
+    """,
+]
+
+# Definido por ensure_title_search_index; sem FTS5 a busca usa ILIKE
+_fts_available = False
+
+def ensure_title_search_index(engine: Engine) -> bool:
+    """
+    Cria o índice de texto dos títulos (e seus gatilhos) se ainda não existir,
+    populando-o a partir de movies na criação. Retorna False se o SQLite não
+    tiver suporte a FTS5.
+    """
+    global _fts_available
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type='table' AND name=:name"),
+                {"name": TITLE_FTS_TABLE}
+            ).first() is not None
+            for ddl in _TITLE_FTS_DDL:
+                conn.execute(text(ddl))
+            if not exists:
+                logger.info("Criando índice de busca textual dos títulos...")
+                conn.execute(text(f"INSERT INTO {TITLE_FTS_TABLE}({TITLE_FTS_TABLE}) VALUES ('rebuild')"))
+    except Exception as e:
+        logger.warning(f"Busca textual indisponível, usando ILIKE: {e}")
+        _fts_available = False
+        return False
+
+    _fts_available = True
+    return True
+
+def title_match_expression(title: str) -> Optional[str]:
+    """
+    Converte o texto digitado em uma consulta FTS5 em que todas as palavras
+    devem aparecer no título, cada uma como prefixo ("star wa" encontra
+    "Star Wars"). Retorna None se não houver palavras pesquisáveis.
+    """
+    tokens = re.findall(r"\w+", title.lower())
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def filter_by_title(statement: Select, title: str) -> Tuple[Select, List]:
+    """
+    Filtra a consulta de filmes pelo título e retorna a ordenação a aplicar:
+    relevância (bm25) quando o índice FTS5 está disponível; caso contrário a
+    busca usa ILIKE e a ordenação é por título.
+    """
+    match = title_match_expression(title)
+    if not _fts_available or match is None:
+        return statement.where(models.Movie.title.ilike(f"%{title}%")), [models.Movie.title]
+
+    statement = (
+        statement.join(title_fts, title_fts.c.rowid == models.Movie.id)
+        .where(title_fts.c.title.op("MATCH")(match))
+    )
+    return statement, [title_fts.c.rank, models.Movie.title]
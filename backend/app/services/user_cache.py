@@ -0,0 +1,58 @@
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from sqlalchemy import event
+
+from app import models, schemas
+from app.core.config import settings
+
+# Configuração do logger
+logger = logging.getLogger("app.user_cache")
+
+class CachedUser(NamedTuple):
+    user: schemas.User
+    expires_at: float
+
+# Usuários ativos autenticados recentemente, pelo id (o `sub` do token), em ordem LRU
+_users: "OrderedDict[int, CachedUser]" = OrderedDict()
+_users_lock = threading.Lock()
+
+def get_cached_user(user_id: int) -> Optional[schemas.User]:
+    """Usuário guardado por store_user, ou None se ausente ou expirado."""
+    with _users_lock:
+        entry = _users.get(user_id)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del _users[user_id]
+            return None
+        _users.move_to_end(user_id)
+        return entry.user
+
+def store_user(user: schemas.User) -> None:
+    """
+    Guarda um usuário ativo por USER_CACHE_TTL_SECONDS, descartando os menos
+    usados além de USER_CACHE_SIZE. Usuários inativos não são guardados.
+    """
+    if not user.is_active or settings.USER_CACHE_TTL_SECONDS <= 0:
+        return
+    with _users_lock:
+        _users[user.id] = CachedUser(user, time.monotonic() + settings.USER_CACHE_TTL_SECONDS)
+        _users.move_to_end(user.id)
+        while len(_users) > settings.USER_CACHE_SIZE:
+            _users.popitem(last=False)
+
+def invalidate_user(user_id: int) -> None:
+    """Descarta o usuário do cache (alterado, desativado ou removido)."""
+    with _users_lock:
+        _users.pop(user_id, None)
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: models.User) -> None:
+    # Qualquer escrita de um usuário pelo ORM, em sessões síncronas ou assíncronas
+    # deste processo. Alterações feitas fora do ORM expiram pelo TTL.
+    invalidate_user(target.id)
@@ -1,259 +1,418 @@
-import csv
 import os
-import re
-from typing import Dict, List, Set, Tuple
-
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
 import pandas as pd
+from sqlalchemy import bindparam, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from app import models
+from app.core.config import settings
 from app.database.session import Base, engine
-
-def extract_year_from_title(title: str) -> Tuple[str, int]:
+from app.services.catalog import update_genre_masks
+from app.services.ranking import refresh_movie_rankings
+from app.utils.etl_state import FileWatermark, clear_watermarks
+from app.utils.movielens_files import (
+    DEFAULT_GENRES,
+    csv_ranges,
+    read_catalog,
+    read_ratings,
+    read_tags,
+)
+
+# PRAGMAs do SQLite durante a importação: cache de páginas de 256 MB e
+# temporários em memória. O synchronous fica no padrão (FULL): cada bloco
+# confirmado grava as linhas e a marca de etl_file_state juntas, e a
+# importação seguinte continua dessa marca, então o commit precisa ser durável
+# (há um commit por bloco de ~16 MB, e o fsync quase não pesa na carga)
+BULK_LOAD_PRAGMAS = {
+    "cache_size": "-262144",
+    "temp_store": "MEMORY",
+}
+
+@contextmanager
+def bulk_load_session() -> Iterator[Session]:
     """
-    Extrai o ano do título do filme, se disponível.
-    Retorna o título limpo e o ano.
+    Sessão em uma conexão própria com BULK_LOAD_PRAGMAS aplicados, restaurando
+    os valores anteriores da conexão ao final (ela volta ao pool).
     """
-    year_pattern = r'(\(\d{4}\))$'
-    match = re.search(year_pattern, title)
-
-    if match:
-        year_str = match.group(1).strip('()')
-        cleaned_title = title[:match.start()].strip()
-        return cleaned_title, int(year_str)
-
-    return title, None
-
-def import_movies(db: Session, movies_file: str) -> Dict[int, int]:
+    with engine.connect() as connection:
+        previous = {
+            name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+            for name in BULK_LOAD_PRAGMAS
+        }
+        for name, value in BULK_LOAD_PRAGMAS.items():
+            connection.exec_driver_sql(f"PRAGMA {name} = {value}")
+        connection.commit()
+
+        db = Session(bind=connection)
+        try:
+            yield db
+        finally:
+            db.close()
+            connection.rollback()
+            for name, value in previous.items():
+                connection.exec_driver_sql(f"PRAGMA {name} = {value}")
+            connection.commit()
+
+def load_catalog(db: Session, catalog: pd.DataFrame, update_existing: bool = False) -> Dict[int, int]:
     """
-    Importa os filmes do arquivo CSV para o banco de dados.
+    Grava os filmes, seus gêneros e os links para IMDb e TMDb lidos por
+    read_catalog com poucos INSERT ... ON CONFLICT em lote. Filmes já
+    existentes recebem os links do arquivo; com update_existing, o arquivo
+    manda também no título, no ano e nos gêneros (associações que saíram do
+    arquivo são apagadas). Os ids internos nunca mudam.
     Retorna um mapeamento de movie_id original para id do banco de dados.
     """
     print("Importando filmes...")
 
-    # Mapear nomes de gêneros para objetos Genre
-    genre_map = {}
+    # Gêneros padrão e os novos do arquivo, na ordem em que aparecem
+    genre_names = list(dict.fromkeys(
+        DEFAULT_GENRES + [name for genres in catalog['genres'] for name in genres]
+    ))
+    db.execute(
+        sqlite_insert(models.Genre).on_conflict_do_nothing(index_elements=['name']),
+        [{"name": name} for name in genre_names]
+    )
+    genre_map = dict(db.execute(select(models.Genre.name, models.Genre.id)).all())
+    print(f"Total de gêneros carregados: {len(genre_map)}")
+
+    movie_ids: List[int] = catalog['movie_id'].tolist()
+    if movie_ids:
+        # Filmes novos são criados; os existentes só recebem os links do arquivo
+        statement = sqlite_insert(models.Movie)
+        updated = {
+            "imdb_id": func.coalesce(statement.excluded.imdb_id, models.Movie.imdb_id),
+            "tmdb_id": func.coalesce(statement.excluded.tmdb_id, models.Movie.tmdb_id),
+        }
+        if update_existing:
+            updated.update(title=statement.excluded.title, year=statement.excluded.year)
+        db.execute(
+            statement.on_conflict_do_update(index_elements=['movie_id'], set_=updated),
+            catalog[['movie_id', 'title', 'year', 'imdb_id', 'tmdb_id']].to_dict('records')
+        )
 
     # Mapear movie_id original para id do banco
-    movie_id_map = {}
-
-    # Certificar-se que temos gêneros básicos no sistema caso o arquivo esteja vazio
-    default_genres = [
-        "Action", "Adventure", "Animation", "Children", "Comedy",
-        "Crime", "Documentary", "Drama", "Fantasy", "Film-Noir",
-        "Horror", "IMAX", "Musical", "Mystery", "Romance",
-        "Sci-Fi", "Thriller", "War", "Western"
+    file_movie_ids = set(movie_ids)
+    movie_id_map = {
+        movie_id: db_id
+        for movie_id, db_id in db.execute(select(models.Movie.movie_id, models.Movie.id)).all()
+        if movie_id in file_movie_ids
+    }
+
+    genre_links = [
+        {"movie_id": movie_id_map[movie_id], "genre_id": genre_map[name]}
+        for movie_id, genres in zip(movie_ids, catalog['genres'])
+        for name in genres
     ]
-
-    print("Verificando gêneros existentes...")
-    for genre_name in default_genres:
-        # Verificar se o gênero já existe
-        genre = db.query(models.Genre).filter(models.Genre.name == genre_name).first()
-        if not genre:
-            print(f"Criando gênero padrão: {genre_name}")
-            genre = models.Genre(name=genre_name)
-            db.add(genre)
-
-    # Commit para salvar os gêneros padrão
-    db.commit()
-    print("Gêneros padrão verificados")
-
-    # Carregar todos os gêneros em um dicionário para uso posterior
-    all_genres = db.query(models.Genre).all()
-    for genre in all_genres:
-        genre_map[genre.name] = genre
-
-    print(f"Total de gêneros carregados: {len(genre_map)}")
-
-    with open(movies_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            # Extrair o ano do título
-            title, year = extract_year_from_title(row['title'])
-
-            # Criar ou obter gêneros
-            genres = row['genres'].split('|')
-            genre_objects = []
-
-            for genre_name in genres:
-                if genre_name == '(no genres listed)':
-                    continue
-
-                if genre_name not in genre_map:
-                    # Tentar obter do banco, caso tenha sido adicionado em outra iteração
-                    genre = db.query(models.Genre).filter(models.Genre.name == genre_name).first()
-                    if not genre:
-                        print(f"Criando novo gênero: {genre_name}")
-                        genre = models.Genre(name=genre_name)
-                        db.add(genre)
-                        db.flush()  # Para obter o ID
-                    genre_map[genre_name] = genre
-
-                if genre_name in genre_map:
-                    genre_objects.append(genre_map[genre_name])
-
-            # Verificar se o filme já existe
-            movie = db.query(models.Movie).filter(models.Movie.movie_id == int(row['movieId'])).first()
-
-            if not movie:
-                # Criar novo filme
-                movie = models.Movie(
-                    movie_id=int(row['movieId']),
-                    title=title,
-                    year=year,
-                    genres=genre_objects
-                )
-                db.add(movie)
-                db.flush()  # Para obter o ID
-
-            movie_id_map[int(row['movieId'])] = movie.id
+    if genre_links:
+        db.execute(sqlite_insert(models.movie_genre).on_conflict_do_nothing(), genre_links)
+
+    if update_existing and movie_id_map:
+        # Gêneros retirados de filmes do arquivo
+        links = models.movie_genre.c
+        file_db_ids = set(movie_id_map.values())
+        current = {
+            (movie_id, genre_id)
+            for movie_id, genre_id in db.execute(select(links.movie_id, links.genre_id))
+            if movie_id in file_db_ids
+        }
+        stale = current - {(link["movie_id"], link["genre_id"]) for link in genre_links}
+        if stale:
+            db.execute(
+                delete(models.movie_genre).where(
+                    links.movie_id == bindparam("stale_movie_id"), links.genre_id == bindparam("stale_genre_id")
+                ),
+                [{"stale_movie_id": movie_id, "stale_genre_id": genre_id} for movie_id, genre_id in stale]
+            )
+            print(f"Removidas {len(stale)} associações filme-gênero que saíram do arquivo.")
 
     db.commit()
     print(f"Importados {len(movie_id_map)} filmes e {len(genre_map)} gêneros.")
     return movie_id_map
 
-def import_links(db: Session, links_file: str, movie_id_map: Dict[int, int]) -> None:
+def import_movies(db: Session, movies_file: str, links_file: Optional[str] = None) -> Dict[int, int]:
     """
-    Importa os links para IMDb e TMDb do arquivo CSV.
+    Importa os filmes e os links dos arquivos CSV (read_catalog + load_catalog).
+    Retorna um mapeamento de movie_id original para id do banco de dados.
     """
-    print("Importando links externos...")
-
-    with open(links_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            movie_id = int(row['movieId'])
-
-            if movie_id in movie_id_map:
-                db_id = movie_id_map[movie_id]
-                movie = db.query(models.Movie).filter(models.Movie.id == db_id).first()
+    return load_catalog(db, read_catalog(movies_file, links_file))
 
-                if movie:
-                    movie.imdb_id = row.get('imdbId')
-                    movie.tmdb_id = row.get('tmdbId')
-
-    db.commit()
-    print("Links importados com sucesso.")
-
-def import_ratings(db: Session, ratings_file: str, movie_id_map: Dict[int, int]) -> Dict[int, int]:
+def _insert_rows(db: Session, statement: Any, columns: List[str], rows: List[Tuple[Any, ...]]) -> None:
+    """
+    INSERT em lote com as linhas em tuplas (`columns`, na ordem da tabela),
+    executado direto no driver: o processamento de parâmetros do SQLAlchemy,
+    linha a linha, custaria tanto quanto a própria gravação no SQLite.
     """
-    Importa as avaliações do arquivo CSV.
+    connection = db.connection()
+    compiled = statement.compile(dialect=connection.dialect, column_keys=columns)
+    connection.exec_driver_sql(str(compiled), rows)
+
+def _known_rating_keys(db: Session) -> np.ndarray:
+    """Chaves (user_id << 32 | movie_id) das avaliações já no banco, ordenadas."""
+    # Chaves calculadas no SQLite e lidas direto do driver: milhões de linhas
+    # não passam pela construção de Row do SQLAlchemy
+    result = db.connection().exec_driver_sql("SELECT (user_id << 32) | movie_id FROM ratings")
+    keys = np.fromiter((key for key, in result), dtype=np.int64)
+    return np.unique(keys)
+
+def _create_rating_users(db: Session, user_ids: np.ndarray) -> None:
+    """Cria de uma vez os usuários do sistema de avaliação (e das tags) que ainda não existem."""
+    db.execute(
+        insert(models.User).prefix_with("OR IGNORE"),
+        [
+            {
+                "id": user_id,
+                "username": f"user_{user_id}",
+                "email": f"user_{user_id}@example.com",
+                "hashed_password": "hashed_placeholder_password",  # Placeholder
+                "is_active": True,
+            }
+            for user_id in user_ids.tolist()
+        ]
+    )
+
+def load_ratings(
+    db: Session,
+    batches: Iterable[pd.DataFrame],
+    movie_id_map: Dict[int, int],
+    checkpoint: Optional[Callable[[Session], None]] = None
+) -> Dict[int, int]:
+    """
+    Grava as avaliações lidas por read_ratings, bloco a bloco: os usuários do
+    bloco são criados de uma vez, o mapeamento de filmes e a remoção de
+    duplicatas são feitos com pandas/NumPy e as avaliações novas são inseridas
+    com executemany, com um commit por bloco (precedido de checkpoint, que
+    grava o progresso na mesma transação).
     Retorna um mapeamento de user_id original para id do banco de dados.
     """
     print("Importando avaliações...")
 
-    # Mapear user_id original para id do banco
-    user_id_map = {}
+    # Mapear user_id original para id do banco (os ids são preservados)
+    user_id_map: Dict[int, int] = {}
+
+    # movieId original -> id do banco, para mapear colunas inteiras
+    movie_ids = pd.Series(movie_id_map, dtype="Int64")
+    known_keys = _known_rating_keys(db)
+    rating_columns = ['user_id', 'movie_id', 'rating', 'timestamp']
     rating_count = 0
 
-    # Ler em chunks para evitar problemas de memória
-    for chunk in pd.read_csv(ratings_file, chunksize=10000):
-        for _, row in chunk.iterrows():
-            user_id = int(row['userId'])
-            movie_id = int(row['movieId'])
-
-            # Verificar se o usuário já existe no mapeamento
-            if user_id not in user_id_map:
-                # Verificar se o usuário já existe no banco
-                user = db.query(models.User).filter(models.User.id == user_id).first()
-                if not user:
-                    # Criar usuário do sistema de avaliação
-                    username = f"user_{user_id}"
-                    email = f"user_{user_id}@example.com"
-                    password_hash = "hashed_placeholder_password"  # Placeholder
-
-                    user = models.User(
-                        id=user_id,
-                        username=username,
-                        email=email,
-                        hashed_password=password_hash,
-                        is_active=True
-                    )
-                    db.add(user)
-                    db.flush()
-
-                user_id_map[user_id] = user.id
-
-            # Verificar se o filme existe no mapeamento
-            if movie_id in movie_id_map:
-                db_movie_id = movie_id_map[movie_id]
-
-                # Verificar se a avaliação já existe
-                existing_rating = db.query(models.Rating).filter(
-                    models.Rating.user_id == user_id_map[user_id],
-                    models.Rating.movie_id == db_movie_id
-                ).first()
-
-                if not existing_rating:
-                    # Criar nova avaliação
-                    rating = models.Rating(
-                        user_id=user_id_map[user_id],
-                        movie_id=db_movie_id,
-                        rating=float(row['rating']),
-                        timestamp=int(row['timestamp'])
-                    )
-                    db.add(rating)
-                    rating_count += 1
-
-                    # Commit a cada 1000 avaliações para evitar transações muito grandes
-                    if rating_count % 1000 == 0:
-                        db.commit()
-                        print(f"Importadas {rating_count} avaliações...")
+    for chunk in batches:
+        user_ids = np.unique(chunk['userId'].to_numpy())
+        if user_ids.size:
+            _create_rating_users(db, user_ids)
+            user_id_map.update((user_id, user_id) for user_id in user_ids.tolist())
+
+        # Filmes fora do catálogo são descartados
+        db_movie_ids = chunk['movieId'].map(movie_ids)
+        mask = db_movie_ids.notna().to_numpy()
+        user_col = chunk['userId'].to_numpy()[mask]
+        movie_col = db_movie_ids.to_numpy(dtype=np.int64, na_value=0)[mask]
+        rating_col = chunk['rating'].to_numpy()[mask]
+        timestamp_col = chunk['timestamp'].to_numpy()[mask]
+
+        # Uma avaliação por (usuário, filme): a primeira do arquivo, e só se ainda não existir
+        keys = (user_col << 32) | movie_col
+        keys, first = np.unique(keys, return_index=True)
+        new = ~np.isin(keys, known_keys, assume_unique=True)
+        keys, first = keys[new], np.sort(first[new])
+        if keys.size:
+            known_keys = np.insert(known_keys, np.searchsorted(known_keys, keys), keys)
+            _insert_rows(db, insert(models.Rating), rating_columns, list(zip(
+                user_col[first].tolist(),
+                movie_col[first].tolist(),
+                rating_col[first].tolist(),
+                timestamp_col[first].tolist(),
+            )))
+        if checkpoint is not None:
+            checkpoint(db)
+        db.commit()
+        rating_count += int(keys.size)
+        print(f"Importadas {rating_count} avaliações...")
 
-    db.commit()
     print(f"Importadas {rating_count} avaliações de {len(user_id_map)} usuários.")
     return user_id_map
 
-def import_tags(db: Session, tags_file: str, movie_id_map: Dict[int, int], user_id_map: Dict[int, int]) -> None:
+def import_ratings(db: Session, ratings_file: str, movie_id_map: Dict[int, int]) -> Dict[int, int]:
+    """
+    Importa as avaliações do arquivo CSV em lote (read_ratings + load_ratings).
+    Retorna um mapeamento de user_id original para id do banco de dados.
     """
-    Importa as tags do arquivo CSV.
+    batches = (read_ratings(ratings_file, start, end) for start, end in csv_ranges(ratings_file))
+    return load_ratings(db, batches, movie_id_map)
+
+def load_tags(
+    db: Session,
+    batches: Iterable[pd.DataFrame],
+    movie_id_map: Dict[int, int],
+    checkpoint: Optional[Callable[[Session], None]] = None
+) -> None:
+    """
+    Grava as tags lidas por read_tags, bloco a bloco: os usuários do bloco são
+    criados de uma vez, como nas avaliações, os filmes são mapeados por
+    coluna, as tags repetidas são descartadas em memória contra o conjunto de
+    chaves (usuário, filme, tag) já gravadas e as novas são inseridas com
+    executemany, com um commit por bloco (precedido de checkpoint). O índice
+    único ix_tags_user_movie_tag garante a deduplicação também no banco.
     """
     print("Importando tags...")
 
+    movies = pd.Series(movie_id_map, dtype="Int64")
+    known_tags: Set[Tuple[int, int, str]] = set(
+        db.execute(select(models.Tag.user_id, models.Tag.movie_id, models.Tag.tag)).tuples()
+    )
+    statement = sqlite_insert(models.Tag).on_conflict_do_nothing(
+        index_elements=['user_id', 'movie_id', 'tag']
+    )
     tag_count = 0
 
-    with open(tags_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            user_id = int(row['userId'])
-            movie_id = int(row['movieId'])
-
-            # Verificar se o usuário e o filme existem nos mapeamentos
-            if user_id in user_id_map and movie_id in movie_id_map:
-                db_user_id = user_id_map[user_id]
-                db_movie_id = movie_id_map[movie_id]
-
-                # Verificar se a tag já existe
-                existing_tag = db.query(models.Tag).filter(
-                    models.Tag.user_id == db_user_id,
-                    models.Tag.movie_id == db_movie_id,
-                    models.Tag.tag == row['tag']
-                ).first()
-
-                if not existing_tag:
-                    # Criar nova tag
-                    tag = models.Tag(
-                        user_id=db_user_id,
-                        movie_id=db_movie_id,
-                        tag=row['tag'],
-                        timestamp=int(row['timestamp'])
-                    )
-                    db.add(tag)
-                    tag_count += 1
-
-                    # Commit a cada 1000 tags para evitar transações muito grandes
-                    if tag_count % 1000 == 0:
-                        db.commit()
-                        print(f"Importadas {tag_count} tags...")
+    for chunk in batches:
+        # Um bloco já marcado como importado não pode depender de usuários de
+        # blocos futuros de ratings.csv: os que faltam são criados aqui
+        user_ids = np.unique(chunk['userId'].to_numpy())
+        if user_ids.size:
+            _create_rating_users(db, user_ids)
+
+        # Filmes fora do catálogo são descartados
+        db_movie_ids = chunk['movieId'].map(movies)
+        mask = db_movie_ids.notna().to_numpy()
+
+        new_tags = []
+        for user_id, movie_id, tag, timestamp in zip(
+            chunk['userId'].to_numpy()[mask].tolist(),
+            db_movie_ids.to_numpy(dtype=np.int64, na_value=0)[mask].tolist(),
+            chunk['tag'].to_numpy()[mask].tolist(),
+            chunk['timestamp'].to_numpy()[mask].tolist(),
+        ):
+            key = (user_id, movie_id, tag)
+            if key in known_tags:
+                continue
+            known_tags.add(key)
+            new_tags.append((user_id, movie_id, tag, timestamp))
+
+        if new_tags:
+            _insert_rows(db, statement, ['user_id', 'movie_id', 'tag', 'timestamp'], new_tags)
+        if checkpoint is not None:
+            checkpoint(db)
+        db.commit()
+        tag_count += len(new_tags)
+        print(f"Importadas {tag_count} tags...")
 
-    db.commit()
     print(f"Importadas {tag_count} tags.")
 
-def import_movielens_data(data_dir: str) -> None:
+def import_tags(db: Session, tags_file: str, movie_id_map: Dict[int, int]) -> None:
+    """
+    Importa as tags do arquivo CSV em lote (read_tags + load_tags).
+    """
+    batches = (read_tags(tags_file, start, end) for start, end in csv_ranges(tags_file))
+    load_tags(db, batches, movie_id_map)
+
+# Tarefa de leitura: função de app/utils/movielens_files.py e seus argumentos
+ReadTask = Tuple[Callable[..., pd.DataFrame], Tuple[Any, ...]]
+
+def _submit_reads(
+    pool: ProcessPoolExecutor,
+    tasks: List[ReadTask],
+    results: "queue.Queue[Optional[Future]]",
+    stop: threading.Event
+) -> None:
+    """
+    Envia as leituras de um arquivo ao pool, em ordem, e coloca os futures na
+    fila limitada; com a fila cheia espera o gravador consumir um bloco. Um
+    None marca o fim do arquivo. Roda em uma thread por arquivo.
+    """
+    for item in [*tasks, None]:
+        if stop.is_set():
+            return
+        future = pool.submit(item[0], *item[1]) if item is not None else None
+        while True:
+            try:
+                results.put(future, timeout=0.1)
+                break
+            except queue.Full:
+                if stop.is_set():
+                    return
+
+def _read_results(results: "queue.Queue[Optional[Future]]") -> Iterator[pd.DataFrame]:
+    """Blocos já lidos de um arquivo, na ordem do arquivo."""
+    while True:
+        future = results.get()
+        if future is None:
+            return
+        yield future.result()
+
+@contextmanager
+def _read_pipeline(tasks: Dict[str, List[ReadTask]], workers: int) -> Iterator[Dict[str, Iterator[pd.DataFrame]]]:
     """
-    Importa todos os dados do MovieLens para o banco de dados.
+    Blocos lidos de cada arquivo, por nome. Com mais de um worker as leituras
+    rodam em um pool de processos, à frente da gravação até o limite das
+    filas; com um só, são feitas nesta thread, quando pedidas.
+    """
+    if workers <= 1:
+        yield {name: (read(*args) for read, args in file_tasks) for name, file_tasks in tasks.items()}
+        return
+
+    stop = threading.Event()
+    # "spawn": o ETL roda em uma thread do servidor e fork com threads ativas não é seguro
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        results = {name: queue.Queue(maxsize=settings.ETL_QUEUE_SIZE) for name in tasks}
+        for name, file_tasks in tasks.items():
+            threading.Thread(
+                target=_submit_reads, args=(pool, file_tasks, results[name], stop), daemon=True
+            ).start()
+        yield {name: _read_results(file_results) for name, file_results in results.items()}
+    finally:
+        # Interromper as leituras pendentes se a gravação terminou antes
+        stop.set()
+        pool.shutdown(wait=True, cancel_futures=True)
+
+# Tabelas recarregadas por inteiro na importação forçada, filhas antes das mães.
+# Filmes, gêneros e usuários são mantidos (e atualizados pela importação) para
+# que os ids referenciados por favoritos e contas não mudem.
+RELOADED_TABLES = [
+    models.Tag.__table__,
+    models.Rating.__table__,
+    models.UserRecommendation.__table__,
+    models.MovieRanking.__table__,
+    models.movie_genre,
+]
+
+def clear_loaded_data(db: Session) -> None:
+    """Esvazia RELOADED_TABLES e as marcas d'água do ETL, com um commit."""
+    print("Limpando dados importados anteriormente...")
+    for table in RELOADED_TABLES:
+        db.execute(delete(table))
+    clear_watermarks(db)
+    db.commit()
+
+def _checkpoint(watermark: FileWatermark, ranges: List[Tuple[int, int]]) -> Callable[[Session], None]:
+    """Avança a marca até o fim do próximo bloco de `ranges` a cada bloco gravado."""
+    ends = iter([end for _, end in ranges])
+    return lambda db: watermark.advance(db, next(ends))
+
+def import_movielens_data(data_dir: str, workers: Optional[int] = None, force: bool = False) -> None:
+    """
+    Importa os dados do MovieLens para o banco de dados, de forma incremental.
+
+    Cada arquivo tem uma marca d'água (app/utils/etl_state.py): só os bytes
+    depois dela são lidos, então uma nova execução importa apenas o que foi
+    acrescentado aos CSVs e uma importação interrompida continua do último
+    bloco gravado. Arquivos alterados antes da marca são relidos por inteiro,
+    sem duplicar linhas. Com force, os dados importados são apagados e tudo é
+    recarregado.
+
+    A leitura e a transformação dos CSVs (catálogo, blocos de avaliações e de
+    tags) rodam em paralelo em um pool de processos, enquanto esta thread,
+    a única que grava no SQLite, consome os blocos de cada arquivo na ordem
+    das dependências: filmes (mapa de ids), avaliações (usuários e ranking) e
+    tags. O tempo total tende ao da etapa mais lenta.
     """
     print("Iniciando importação dos dados do MovieLens...")
 
@@ -266,22 +425,57 @@ def import_movielens_data(data_dir: str) -> None:
     ratings_file = os.path.join(data_dir, 'ratings.csv')
     tags_file = os.path.join(data_dir, 'tags.csv')
 
-    # Criar sessão do banco de dados
-    db = Session(engine)
-
-    try:
-        # Importar dados em sequência
-        movie_id_map = import_movies(db, movies_file)
-        import_links(db, links_file, movie_id_map)
-        user_id_map = import_ratings(db, ratings_file, movie_id_map)
-        import_tags(db, tags_file, movie_id_map, user_id_map)
-
-        print("Importação concluída com sucesso!")
-    except Exception as e:
-        db.rollback()
-        print(f"Erro durante a importação: {e}")
-    finally:
-        db.close()
+    workers = workers or settings.ETL_WORKERS or os.cpu_count() or 1
+
+    # Criar sessão do banco de dados, com os PRAGMAs de carga em lote
+    with bulk_load_session() as db:
+        try:
+            if force:
+                clear_loaded_data(db)
+
+            # Marcas d'água: o catálogo é relido inteiro se movies.csv ou links.csv mudaram,
+            # e então o arquivo manda em títulos, anos e gêneros dos filmes existentes
+            catalog_marks = [
+                FileWatermark.load(db, 'movies.csv', movies_file),
+                FileWatermark.load(db, 'links.csv', links_file),
+            ]
+            catalog_changed = not all(mark.complete for mark in catalog_marks)
+            if catalog_changed:
+                catalog_marks = [FileWatermark(mark.file_name, mark.path) for mark in catalog_marks]
+            ratings_mark = FileWatermark.load(db, 'ratings.csv', ratings_file)
+            tags_mark = FileWatermark.load(db, 'tags.csv', tags_file)
+
+            # Só os blocos depois das marcas
+            ratings_ranges = csv_ranges(ratings_file, ratings_mark.offset)
+            tags_ranges = csv_ranges(tags_file, tags_mark.offset)
+            tasks: Dict[str, List[ReadTask]] = {
+                'catalog': [(read_catalog, (movies_file, links_file))] if catalog_changed else [],
+                'ratings': [(read_ratings, (ratings_file, start, end)) for start, end in ratings_ranges],
+                'tags': [(read_tags, (tags_file, start, end)) for start, end in tags_ranges],
+            }
+
+            with _read_pipeline(tasks, workers) as batches:
+                # Gravar na ordem das dependências
+                if catalog_changed:
+                    catalog, = batches['catalog']
+                    load_catalog(db, catalog, update_existing=True)
+                    update_genre_masks(db)  # máscara de gêneros dos filmes
+                    for mark in catalog_marks:
+                        mark.advance(db, os.path.getsize(mark.path))
+                    db.commit()
+                else:
+                    print("Filmes e links sem alterações.")
+                movie_id_map = dict(db.execute(select(models.Movie.movie_id, models.Movie.id)).all())
+
+                load_ratings(db, batches['ratings'], movie_id_map, _checkpoint(ratings_mark, ratings_ranges))
+                if ratings_ranges:
+                    refresh_movie_rankings(db, force=True)  # agregados de avaliação dos filmes
+                load_tags(db, batches['tags'], movie_id_map, _checkpoint(tags_mark, tags_ranges))
+
+            print("Importação concluída com sucesso!")
+        except Exception as e:
+            db.rollback()
+            print(f"Erro durante a importação: {e}")
 
 if __name__ == "__main__":
     # Caminho para o diretório de dados do MovieLens
@@ -4,13 +4,27 @@ import logging
 import urllib.request
 import zipfile
 import tempfile
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator
 from sqlalchemy.orm import Session
 from sqlalchemy import func, select, text
 
 from app import models
+from app.core.config import settings
+from app.services import model_store
 from app.utils.data_import import import_movielens_data
+from app.services.recommendation import warm_recommendation_model
+from app.services.ranking import refresh_movie_rankings
+from app.services.catalog import refresh_genre_index, refresh_title_index
+from app.services.search import ensure_title_search_index
 from app.database.session import engine, Base
+from app.database.migrations import run_migrations
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
 
 # Configuração do logger
 logging.basicConfig(level=logging.INFO)
@@ -20,9 +34,40 @@ logger = logging.getLogger("app.etl")
 etl_executed = False
 etl_lock = threading.Lock()
 
+# Sufixo do arquivo de trava do ETL, criado ao lado do banco SQLite
+ETL_LOCK_SUFFIX = ".etl.lock"
+
 # URL padrão para o dataset MovieLens
 MOVIELENS_URL = "https://files.grouplens.org/datasets/movielens/ml-latest-small.zip"
 
+def _etl_lock_path() -> str:
+    """Arquivo de trava ao lado do banco (ou no diretório temporário, para bancos em memória)."""
+    database = engine.url.database
+    if database and database != ":memory:":
+        return os.path.abspath(database) + ETL_LOCK_SUFFIX
+    return os.path.join(tempfile.gettempdir(), "movielens" + ETL_LOCK_SUFFIX)
+
+@contextmanager
+def etl_process_lock() -> Iterator[None]:
+    """
+    Trava exclusiva entre processos (workers do uvicorn/gunicorn,
+    scripts/run_etl.py) sobre o banco. etl_lock só serializa as threads de um
+    processo, e duas importações simultâneas gravariam as mesmas avaliações;
+    quem espera a trava encontra as marcas já avançadas e não reimporta nada.
+    """
+    with open(_etl_lock_path(), "a") as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                logger.info("ETL em execução em outro processo. Aguardando...")
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
 def is_database_empty(db: Session) -> bool:
     """
     Verifica se o banco de dados está vazio (sem filmes carregados).
@@ -108,20 +153,25 @@ def download_movielens_data(url=MOVIELENS_URL, target_dir=None):
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
 
-def run_etl(data_dir=None, download_if_missing=True):
+def run_etl(data_dir=None, download_if_missing=True, force=False):
     """
     Executa o processo de ETL, carregando os dados do MovieLens para o banco de dados.
 
+    A importação é incremental: em um banco já carregado só o que foi
+    acrescentado aos arquivos desde a última execução é importado, e uma
+    importação interrompida continua do último bloco gravado.
+
     Args:
         data_dir: Diretório contendo os arquivos do MovieLens. Se None, usa o diretório padrão.
         download_if_missing: Se True, baixa os dados se não forem encontrados localmente.
+        force: Se True, apaga os dados importados e recarrega tudo a partir dos arquivos.
     """
     global etl_executed
 
-    # Usar lock para garantir que apenas uma thread executará o ETL
-    with etl_lock:
+    # Usar locks para garantir que apenas uma thread, de um único processo, executará o ETL
+    with etl_lock, etl_process_lock():
         # Verificar se o ETL já foi executado nesta instância
-        if etl_executed:
+        if etl_executed and not force:
             logger.info("ETL já foi executado nesta instância da aplicação.")
             return
 
@@ -130,14 +180,14 @@ def run_etl(data_dir=None, download_if_missing=True):
             logger.info("Banco de dados não inicializado. Criando tabelas...")
             setup_database()
 
-        # Verificar se os dados já foram carregados
+        # Migrações do esquema (colunas, tabelas, índices) em bancos novos e existentes
+        run_migrations(engine)
+
+        # Índice de busca textual dos títulos, mantido por gatilhos em movies
+        ensure_title_search_index(engine)
+
         db = Session(engine)
         try:
-            if not is_database_empty(db):
-                logger.info("Banco de dados já contém dados. Pulando ETL.")
-                etl_executed = True
-                return
-
             # Determinar o diretório de dados
             if data_dir is None:
                 # Caminho padrão relativo ao diretório raiz do projeto
@@ -146,7 +196,10 @@ def run_etl(data_dir=None, download_if_missing=True):
 
             # Verificar se o diretório de dados existe
             if not os.path.exists(data_dir):
-                if download_if_missing:
+                if not force and not is_database_empty(db):
+                    # Sem arquivos não há o que acrescentar a um banco já carregado
+                    logger.info("Banco de dados já contém dados e não há arquivos para importar. Pulando ETL.")
+                elif download_if_missing:
                     logger.info(f"Diretório de dados não encontrado: {data_dir}")
                     logger.info("Baixando dataset MovieLens...")
                     data_dir = download_movielens_data()
@@ -155,12 +208,26 @@ def run_etl(data_dir=None, download_if_missing=True):
                     logger.error("Por favor, verifique se os dados do MovieLens foram baixados corretamente.")
                     return
 
-            # Importar dados
-            logger.info(f"Iniciando ETL com dados de: {data_dir}")
-            import_movielens_data(data_dir)
+            # Importar dados (só os novos, a menos que force)
+            if os.path.exists(data_dir):
+                if force:
+                    logger.info(f"Recarregando todos os dados de: {data_dir}")
+                else:
+                    logger.info(f"Iniciando ETL incremental com dados de: {data_dir}")
+                import_movielens_data(data_dir, force=force)
+                logger.info("ETL concluído com sucesso.")
+
+                # Artefatos do modelo gravados antes da recarga não valem para os novos dados
+                if force and settings.RECOMMENDER_ARTIFACT_DIR:
+                    model_store.clear_artifacts(settings.RECOMMENDER_ARTIFACT_DIR)
 
             etl_executed = True
-            logger.info("ETL concluído com sucesso.")
+
+            # Atualizar o ranking e aquecer o modelo de recomendação com os dados atuais
+            refresh_movie_rankings(db)
+            refresh_genre_index(db)
+            refresh_title_index(db)
+            warm_recommendation_model(full=force)
         except Exception as e:
             logger.error(f"Erro durante o ETL: {e}")
         finally:
@@ -0,0 +1,87 @@
+import os
+import time
+import hashlib
+import logging
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Configuração do logger
+logger = logging.getLogger("app.etl_state")
+
+# Bytes lidos por vez ao calcular o SHA-256 de um trecho do arquivo
+_HASH_BLOCK_BYTES = 1024 * 1024
+
+def _hash_range(path: str, start: int, end: int, hasher) -> None:
+    """Acrescenta ao hasher os bytes [start, end) do arquivo."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            block = f.read(min(_HASH_BLOCK_BYTES, remaining))
+            if not block:
+                break
+            hasher.update(block)
+            remaining -= len(block)
+
+class FileWatermark:
+    """
+    Progresso da importação de um arquivo do MovieLens: `offset` bytes já
+    importados, sempre em fim de linha, e o SHA-256 deles. Cada bloco gravado
+    avança a marca na mesma transação dos seus dados (advance), então uma
+    importação interrompida recomeça do último bloco confirmado.
+    """
+
+    def __init__(self, file_name: str, path: str, offset: int = 0, hasher=None):
+        self.file_name = file_name
+        self.path = path
+        self.offset = offset
+        self.hasher = hasher if hasher is not None else hashlib.sha256()
+
+    @classmethod
+    def load(cls, db: Session, file_name: str, path: str) -> "FileWatermark":
+        """
+        Marca gravada do arquivo, se o trecho já importado continua igual
+        (mesmo SHA-256); senão, uma marca no início do arquivo, que é então
+        reimportado por inteiro (as linhas já gravadas são descartadas pela
+        deduplicação da importação).
+        """
+        state: Optional[models.EtlFileState] = db.get(models.EtlFileState, file_name)
+        if state is None or state.byte_offset == 0:
+            return cls(file_name, path)
+
+        if os.path.getsize(path) >= state.byte_offset:
+            hasher = hashlib.sha256()
+            _hash_range(path, 0, state.byte_offset, hasher)
+            if hasher.hexdigest() == state.checksum:
+                return cls(file_name, path, state.byte_offset, hasher)
+
+        logger.info(f"{file_name} mudou desde a última importação; o arquivo será lido desde o início.")
+        return cls(file_name, path)
+
+    @property
+    def complete(self) -> bool:
+        """Se o arquivo inteiro já foi importado."""
+        return self.offset >= os.path.getsize(self.path)
+
+    def advance(self, db: Session, end: int) -> None:
+        """Marca como importados os bytes até `end` (fim de linha). Não faz commit."""
+        _hash_range(self.path, self.offset, end, self.hasher)
+        self.offset = end
+
+        values = {
+            "file_name": self.file_name,
+            "byte_offset": self.offset,
+            "checksum": self.hasher.hexdigest(),
+            "updated_at": int(time.time()),
+        }
+        statement = sqlite_insert(models.EtlFileState).values(values)
+        db.execute(statement.on_conflict_do_update(index_elements=["file_name"], set_=values))
+
+def clear_watermarks(db: Session) -> None:
+    """Descarta as marcas de todos os arquivos (importação forçada). Não faz commit."""
+    db.execute(delete(models.EtlFileState))
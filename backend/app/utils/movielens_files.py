@@ -0,0 +1,119 @@
+import io
+import os
+import re
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Leitura e transformação dos CSVs do MovieLens, sem acesso ao banco: as
+# funções recebem caminhos (e intervalos de bytes) e retornam DataFrames, para
+# rodarem nos processos de leitura do ETL (app/utils/data_import.py)
+
+# Tamanho aproximado dos blocos de ratings.csv e tags.csv lidos por vez
+CSV_CHUNK_BYTES = 16 * 1024 * 1024
+
+RATINGS_DTYPES = {'userId': np.int64, 'movieId': np.int64, 'rating': np.float64, 'timestamp': np.int64}
+TAGS_DTYPES = {'userId': np.int64, 'movieId': np.int64, 'tag': str, 'timestamp': np.int64}
+
+# Gêneros básicos, criados mesmo que o arquivo de filmes esteja vazio
+DEFAULT_GENRES = [
+    "Action", "Adventure", "Animation", "Children", "Comedy",
+    "Crime", "Documentary", "Drama", "Fantasy", "Film-Noir",
+    "Horror", "IMAX", "Musical", "Mystery", "Romance",
+    "Sci-Fi", "Thriller", "War", "Western"
+]
+
+NO_GENRES = '(no genres listed)'
+
+def extract_year_from_title(title: str) -> Tuple[str, int]:
+    """
+    Extrai o ano do título do filme, se disponível.
+    Retorna o título limpo e o ano.
+    """
+    year_pattern = r'(\(\d{4}\))$'
+    match = re.search(year_pattern, title)
+
+    if match:
+        year_str = match.group(1).strip('()')
+        cleaned_title = title[:match.start()].strip()
+        return cleaned_title, int(year_str)
+
+    return title, None
+
+def read_catalog(movies_file: str, links_file: Optional[str] = None) -> pd.DataFrame:
+    """
+    Lê movies.csv e links.csv e os junta em memória: uma linha por filme com
+    movie_id, title (sem o ano), year, genres (lista de nomes), imdb_id e
+    tmdb_id. Os links são mantidos como texto, como no arquivo ("0114709").
+    """
+    movies = pd.read_csv(movies_file, dtype=str, keep_default_na=False)
+    catalog = pd.DataFrame({'movie_id': movies['movieId'].astype(np.int64)})
+
+    # Extrair o ano do título
+    titles = [extract_year_from_title(title) for title in movies['title']]
+    catalog['title'] = [title for title, _ in titles]
+    catalog['year'] = pd.Series([year for _, year in titles], dtype=object)
+    catalog['genres'] = [
+        [name for name in genres.split('|') if name != NO_GENRES]
+        for genres in movies['genres']
+    ]
+
+    if links_file is None:
+        catalog['imdb_id'] = None
+        catalog['tmdb_id'] = None
+        return catalog
+
+    links = pd.read_csv(links_file, dtype=str, keep_default_na=False)
+    links = pd.DataFrame({
+        'movie_id': links['movieId'].astype(np.int64),
+        'imdb_id': links['imdbId'],
+        'tmdb_id': links['tmdbId'],
+    }).drop_duplicates('movie_id', keep='last')
+    catalog = catalog.merge(links, on='movie_id', how='left')
+
+    # Filmes sem linha em links.csv ficam sem links (None, não NaN)
+    for column in ('imdb_id', 'tmdb_id'):
+        catalog[column] = catalog[column].astype(object).where(catalog[column].notna(), None)
+    return catalog
+
+def csv_ranges(path: str, start: int = 0, chunk_bytes: int = CSV_CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """
+    Divide o arquivo em intervalos [início, fim) de bytes com cerca de
+    chunk_bytes cada, sempre terminando em fim de linha, para que cada bloco
+    seja lido de forma independente por read_csv_range. Começa em `start`
+    (um fim de linha) ou, com 0, logo depois do cabeçalho.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, 'rb') as f:
+        f.readline()
+        start = max(start, f.tell())
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()  # completa a linha em que o bloco terminou
+            end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def read_csv_range(path: str, start: int, end: int, **kwargs) -> pd.DataFrame:
+    """Lê com pandas só as linhas do intervalo de bytes, com o cabeçalho do arquivo."""
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), **kwargs)
+
+def read_ratings(ratings_file: str, start: int, end: int) -> pd.DataFrame:
+    """Avaliações do intervalo, tipadas, só com a primeira de cada (usuário, filme)."""
+    ratings = read_csv_range(ratings_file, start, end, dtype=RATINGS_DTYPES)
+    return ratings.drop_duplicates(['userId', 'movieId'])
+
+def read_tags(tags_file: str, start: int, end: int) -> pd.DataFrame:
+    """
+    Tags do intervalo, tipadas, só com a primeira de cada (usuário, filme,
+    tag). O texto é lido sem conversão para NaN, então tags como "NA" ficam.
+    """
+    tags = read_csv_range(tags_file, start, end, dtype=TAGS_DTYPES, keep_default_na=False)
+    return tags.drop_duplicates(['userId', 'movieId', 'tag'])
@@ -0,0 +1,61 @@
+import json
+import base64
+import binascii
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import Select, tuple_
+
+# Quantidade de totais (por filtro) mantidos em cache
+TOTALS_CACHE_SIZE = 512
+
+_totals_cache: "OrderedDict[Hashable, int]" = OrderedDict()
+_totals_lock = threading.Lock()
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Cursor opaco com os valores das colunas de ordenação do último item da página."""
+    raw = json.dumps(list(values), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Valores de um cursor gerado por encode_cursor; HTTP 400 se for inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+    return values
+
+def after_cursor(statement: Select, columns: Sequence[Any], cursor: str, descending: bool = False) -> Select:
+    """
+    Restringe a consulta aos itens posteriores ao cursor na ordem (columns),
+    toda ascendente ou toda descendente. A comparação de tuplas é resolvida
+    pelo índice das colunas de ordenação, sem OFFSET.
+    """
+    values = decode_cursor(cursor, len(columns))
+    if descending:
+        return statement.where(tuple_(*columns) < tuple_(*values))
+    return statement.where(tuple_(*columns) > tuple_(*values))
+
+def get_cached_total(key: Hashable) -> Optional[int]:
+    """
+    Total de itens de um filtro guardado por store_total, ou None. A chave deve
+    incluir a versão dos dados para que o valor seja descartado quando eles mudam.
+    """
+    with _totals_lock:
+        total = _totals_cache.get(key)
+        if total is not None:
+            _totals_cache.move_to_end(key)
+        return total
+
+def store_total(key: Hashable, total: int) -> None:
+    """Guarda o total de um filtro, descartando os mais antigos além de TOTALS_CACHE_SIZE."""
+    with _totals_lock:
+        _totals_cache[key] = total
+        _totals_cache.move_to_end(key)
+        while len(_totals_cache) > TOTALS_CACHE_SIZE:
+            _totals_cache.popitem(last=False)
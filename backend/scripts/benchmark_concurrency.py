@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""
+Teste de carga da API com muitos clientes simultâneos.
+
+Cada cliente mantém uma conexão HTTP/1.1 própria e repete requisições aos
+endpoints de filmes (busca por título, filmes mais bem avaliados e detalhes
+por ID, com parâmetros variados para não depender do cache de respostas)
+durante o tempo informado. Ao final mostra a vazão e a latência (p50/p99) por
+endpoint. Usado para comparar a pilha síncrona (threadpool) com a assíncrona,
+com o servidor já em execução:
+
+    uvicorn app.main:app --port 8000
+    python scripts/benchmark_concurrency.py --url http://127.0.0.1:8000 --clients 200
+
+As requisições são escritas diretamente sobre asyncio (sem httpx) para que o
+próprio gerador de carga consuma pouca CPU quando roda na mesma máquina.
+"""
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+from typing import Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+SEARCH_TERMS = ["star", "love", "man", "war", "life", "night", "day", "king", "girl", "dead", "the", "a"]
+
+
+def _next_request(rng: random.Random, prefix: str, token: Optional[str] = None) -> Tuple[str, str]:
+    """Endpoint (nome para o relatório) e caminho com parâmetros da próxima requisição."""
+    choice = rng.random()
+    if token and choice < 0.1:
+        return "recommendations/user", f"{prefix}/recommendations/user?limit=10"
+    if choice < 0.4:
+        params = {"title": rng.choice(SEARCH_TERMS), "skip": rng.randrange(0, 200), "limit": 20}
+        return "movies/search", f"{prefix}/movies/search?{urlencode(params)}"
+    if choice < 0.7:
+        params = {"skip": rng.randrange(0, 2000), "limit": 20}
+        return "movies/top-rated", f"{prefix}/movies/top-rated?{urlencode(params)}"
+    return "movies/by-id", f"{prefix}/movies/by-id/{rng.randrange(1, 5000)}"
+
+
+async def _get(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str,
+               path: str, token: Optional[str]) -> int:
+    """Envia um GET na conexão aberta e lê a resposta inteira; retorna o status."""
+    authorization = f"Authorization: Bearer {token}\r\n" if token else ""
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{authorization}\r\n".encode("latin-1"))
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {
+        name.strip().lower(): value.strip()
+        for name, _, value in (line.partition(":") for line in lines[1:] if line)
+    }
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status
+
+
+async def _client(args, seed: int, deadline: float, latencies: dict, errors: dict) -> None:
+    """Um cliente com sua própria conexão, como um usuário independente."""
+    rng = random.Random(seed)
+    url = urlsplit(args.url)
+    reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+    try:
+        while time.perf_counter() < deadline:
+            name, path = _next_request(rng, args.prefix, args.token)
+            start = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(_get(reader, writer, url.netloc, path, args.token), args.timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                errors[name] += 1
+                writer.close()
+                reader, writer = await asyncio.open_connection(url.hostname, url.port or 80)
+                continue
+            elapsed = time.perf_counter() - start
+            if status < 500:
+                latencies[name].append(elapsed)
+            else:
+                errors[name] += 1
+    finally:
+        writer.close()
+
+
+async def run(args) -> None:
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+
+    # Aquecimento dos índices em memória
+    await _client(args, -1, time.perf_counter() + 1.0, defaultdict(list), defaultdict(int))
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(_client(args, seed, deadline, latencies, errors) for seed in range(args.clients)))
+    elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"{args.clients} clientes, {elapsed:.1f} s: {total} requisições, {total / elapsed:.0f} req/s, "
+          f"{sum(errors.values())} erros")
+    print(f"{'endpoint':>22} {'req':>7} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for name in sorted(latencies):
+        values = np.array(latencies[name]) * 1000
+        print(f"{name:>22} {values.shape[0]:>7} {np.percentile(values, 50):>9.1f} {np.percentile(values, 99):>9.1f}")
+    if total:
+        all_values = np.concatenate([np.array(values) for values in latencies.values()]) * 1000
+        print(f"{'total':>22} {all_values.shape[0]:>7} {np.percentile(all_values, 50):>9.1f} "
+              f"{np.percentile(all_values, 99):>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Teste de carga com clientes simultâneos')
+    parser.add_argument('--url', type=str, default='http://127.0.0.1:8000',
+                        help='Endereço do servidor em execução')
+    parser.add_argument('--prefix', type=str, default='/api/v1',
+                        help='Prefixo das rotas da API')
+    parser.add_argument('--clients', type=int, default=200,
+                        help='Número de clientes simultâneos')
+    parser.add_argument('--duration', type=float, default=20.0,
+                        help='Duração do teste em segundos')
+    parser.add_argument('--timeout', type=float, default=60.0,
+                        help='Tempo máximo por requisição em segundos')
+    parser.add_argument('--token', type=str, default=None,
+                        help='Token JWT para incluir /recommendations/user na carga')
+
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
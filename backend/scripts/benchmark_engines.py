@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Compara os motores de recomendação (item_knn e mf) no dataset ml-latest-small.
+
+Para cada motor mede o tempo de construção, o pico de memória durante a
+construção, o tamanho do modelo resultante e a latência de uma recomendação
+por usuário e de uma busca de filmes similares.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Configurar o logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("engine-benchmark")
+
+# Adicionar o diretório do projeto ao PATH para importações
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_RATINGS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "ml-latest-small", "ratings.csv"
+)
+
+
+def main():
+    from app.core.config import settings
+    from app.services import recommendation as rec
+
+    parser = argparse.ArgumentParser(description='Benchmark dos motores de recomendação')
+    parser.add_argument('--ratings', type=str, default=DEFAULT_RATINGS,
+                        help='Arquivo ratings.csv do MovieLens')
+    parser.add_argument('--queries', type=int, default=200,
+                        help='Número de usuários/filmes consultados por motor')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='Número de recomendações por requisição')
+
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.ratings).rename(columns={'userId': 'user_id', 'movieId': 'movie_id'})
+    matrix, user_to_idx, idx_to_movie, user_means = rec._matrix_from_ratings(df)
+    n_users, n_movies = matrix.shape
+    print(f"{len(df)} avaliações, {n_users} usuários, {n_movies} filmes")
+    print(f"Matriz de similaridade densa (referência): {n_movies ** 2 * 8 / 1e6:.1f} MB")
+
+    rng = np.random.default_rng(0)
+    users = rng.choice(n_users, size=min(args.queries, n_users), replace=False)
+    movies = rng.choice(n_movies, size=min(args.queries, n_movies), replace=False)
+
+    print(f"{'motor':>9} {'construção (s)':>15} {'pico (MB)':>10} {'modelo (MB)':>12} "
+          f"{'usuário (ms)':>13} {'similares (ms)':>15}")
+    for engine in ("item_knn", "mf"):
+        tracemalloc.start()
+        start = time.perf_counter()
+        if engine == "item_knn":
+            index, factors = rec._build_item_neighbors(matrix), None
+            model_bytes = index.neighbors.nbytes + index.scores.nbytes + index.norms.nbytes
+        else:
+            index, factors = None, rec._build_matrix_factors(matrix)
+            model_bytes = factors.user_factors.nbytes + factors.item_factors.nbytes + factors.item_norms.nbytes
+        build_s = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        model = rec.RecommendationModel(
+            matrix=matrix, user_to_idx=user_to_idx, idx_to_movie=idx_to_movie,
+            movie_to_idx={m: i for i, m in idx_to_movie.items()}, user_means=user_means,
+            engine=engine, index=index, factors=factors,
+            last_rating_id=0, built_at=time.time(), version="benchmark"
+        )
+
+        start = time.perf_counter()
+        for user_idx in users:
+            scores = rec._score_user(model, user_idx)
+            scores[matrix.getrow(user_idx).indices] = -np.inf
+            rec._top_k_indices(scores, args.limit)
+        user_ms = (time.perf_counter() - start) / len(users) * 1000
+
+        start = time.perf_counter()
+        for movie_idx in movies:
+            rec._similar_item_indices(model, movie_idx, args.limit)
+        similar_ms = (time.perf_counter() - start) / len(movies) * 1000
+
+        print(f"{engine:>9} {build_s:>15.2f} {peak / 1e6:>10.1f} {model_bytes / 1e6:>12.2f} "
+              f"{user_ms:>13.3f} {similar_ms:>15.3f}")
+
+    print(f"(K={settings.RECOMMENDER_NEIGHBORS} vizinhos, F={settings.RECOMMENDER_FACTORS} fatores)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Benchmark da pontuação de recomendações por usuário.
+
+Gera avaliações sintéticas para catálogos de tamanhos crescentes e mede a
+latência de uma requisição de recomendação com o laço Python original e com
+o caminho vetorizado (produto matriz-vetor + argpartition) sobre o índice de
+vizinhos, além da memória da matriz densa N x N comparada à do índice.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+# Configurar o logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("recommendation-benchmark")
+
+# Adicionar o diretório do projeto ao PATH para importações
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def generate_ratings(n_users: int, n_movies: int, ratings_per_user: int, seed: int = 42) -> pd.DataFrame:
+    """Gera avaliações sintéticas com popularidade de filmes em cauda longa."""
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, n_movies + 1)
+    popularity /= popularity.sum()
+
+    user_ids = np.repeat(np.arange(1, n_users + 1), ratings_per_user)
+    movie_ids = rng.choice(n_movies, size=user_ids.shape[0], p=popularity) + 1
+    ratings = rng.integers(1, 11, size=user_ids.shape[0]) / 2.0
+
+    return pd.DataFrame({'user_id': user_ids, 'movie_id': movie_ids, 'rating': ratings})
+
+
+def legacy_scores(user_ratings: np.ndarray, rated_items: np.ndarray, similarity: np.ndarray) -> np.ndarray:
+    """Reprodução do laço duplo original de get_recommendations_for_user."""
+    recommendation_scores = np.zeros(user_ratings.shape)
+    for item_idx in range(user_ratings.shape[0]):
+        if item_idx in rated_items:
+            continue
+        for rated_item in rated_items:
+            recommendation_scores[item_idx] += user_ratings[rated_item] * similarity[rated_item, item_idx]
+    return recommendation_scores
+
+
+def time_call(fn, repeat: int) -> float:
+    """Retorna a menor latência (em ms) de `repeat` execuções."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    from sklearn.metrics.pairwise import cosine_similarity
+    from app.services.recommendation import (
+        _matrix_from_ratings, _build_item_neighbors, _score_items, _top_k_indices
+    )
+
+    parser = argparse.ArgumentParser(description='Benchmark da pontuação de recomendações')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 5000, 10000],
+                        help='Tamanhos de catálogo a testar')
+    parser.add_argument('--users', type=int, default=1000,
+                        help='Número de usuários sintéticos')
+    parser.add_argument('--ratings-per-user', type=int, default=200,
+                        help='Avaliações por usuário')
+    parser.add_argument('--limit', type=int, default=10,
+                        help='Número de recomendações por requisição')
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='Não medir o laço Python original (lento em catálogos grandes)')
+
+    args = parser.parse_args()
+
+    print(f"{'filmes':>8} {'avaliados':>10} {'laço (ms)':>12} {'vetorizado (ms)':>16} "
+          f"{'densa (MB)':>11} {'índice (MB)':>12} {'índice (s)':>11}")
+    for n_movies in args.sizes:
+        df = generate_ratings(args.users, n_movies, args.ratings_per_user)
+        matrix, user_to_idx, _, _ = _matrix_from_ratings(df)
+
+        start = time.perf_counter()
+        neighbor_index = _build_item_neighbors(matrix)
+        build_s = time.perf_counter() - start
+        index_mb = (neighbor_index.neighbors.nbytes + neighbor_index.scores.nbytes) / 1e6
+        dense_mb = matrix.shape[1] ** 2 * 8 / 1e6
+
+        user_row = matrix.getrow(0)
+        rated_items = user_row.indices
+
+        def vectorized():
+            scores = _score_items(user_row, neighbor_index.weights)
+            scores[rated_items] = -np.inf
+            return _top_k_indices(scores, args.limit)
+
+        vectorized_ms = time_call(vectorized, repeat=20)
+
+        if args.skip_legacy:
+            legacy_ms = float('nan')
+        else:
+            similarity = cosine_similarity(matrix.T)
+            np.fill_diagonal(similarity, 0)
+            user_ratings = user_row.toarray().ravel()
+            legacy_ms = time_call(
+                lambda: np.argsort(legacy_scores(user_ratings, rated_items, similarity))[::-1][:args.limit],
+                repeat=1
+            )
+
+        print(f"{matrix.shape[1]:>8} {rated_items.shape[0]:>10} {legacy_ms:>12.1f} {vectorized_ms:>16.2f} "
+              f"{dense_mb:>11.1f} {index_mb:>12.2f} {build_s:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
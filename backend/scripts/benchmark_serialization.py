@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Compara as duas formas de montar uma página de MovieList (/movies/top-rated):
+
+- orm: objetos Movie com gêneros (selectinload), validados por schemas.MovieList
+  com from_attributes e codificados em JSON, como faz o FastAPI;
+- colunas: consulta só com MOVIE_ROW_COLUMNS, gêneros pela máscara em memória
+  e codificação direta em bytes (encode_movie_list).
+
+Mede separadamente consulta e serialização, por tamanho de página, e confere
+que as duas formas produzem o mesmo JSON.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+
+import numpy as np
+
+# Configurar o logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("serialization-benchmark")
+
+# Adicionar o diretório do projeto ao PATH para importações
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _timed(fn, repeats: int):
+    """Resultado da última chamada e mediana do tempo em ms."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(times))
+
+
+def main():
+    from pydantic import TypeAdapter
+    from sqlalchemy.orm import selectinload
+
+    from app import models, schemas
+    from app.core.config import settings
+    from app.database.session import SessionLocal
+    from app.services.catalog import get_genre_index
+    from app.services.movie_serialization import MOVIE_ROW_COLUMNS, encode_movie_list, orjson
+    from app.services.ranking import popular_movies_select
+
+    parser = argparse.ArgumentParser(description='Benchmark da serialização de MovieList')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 500],
+                        help='Tamanhos de página medidos')
+    parser.add_argument('--repeats', type=int, default=50,
+                        help='Repetições por medida')
+
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    genre_index = get_genre_index(db)
+    adapter = TypeAdapter(schemas.MovieList)
+    sort_columns = [models.MovieRanking.bayesian_score, models.MovieRanking.movie_id]
+    base = popular_movies_select(min_ratings=settings.RANKING_MIN_RATINGS)
+
+    print(f"Codificador JSON do caminho por colunas: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'página':>7} {'orm consulta':>13} {'orm serial.':>12} {'orm total':>10} "
+          f"{'col. consulta':>14} {'col. serial.':>13} {'col. total':>11} {'ganho':>6}")
+    for size in args.sizes:
+        def orm_query():
+            statement = base.add_columns(*sort_columns).options(selectinload(models.Movie.genres))
+            rows = db.execute(statement.limit(size)).all()
+            db.expunge_all()
+            return rows
+
+        def orm_serialize(rows):
+            # Como o FastAPI: validação pelo response_model e json.dumps do resultado
+            content = {"items": [row[0] for row in rows], "total": None, "next_cursor": None}
+            value = adapter.validate_python(content, from_attributes=True)
+            return json.dumps(
+                adapter.dump_python(value, mode="json"),
+                ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+            ).encode("utf-8")
+
+        def column_query():
+            statement = base.with_only_columns(*MOVIE_ROW_COLUMNS, *sort_columns)
+            return db.execute(statement.limit(size)).all()
+
+        orm_rows, orm_query_ms = _timed(orm_query, args.repeats)
+        orm_body, orm_serialize_ms = _timed(lambda: orm_serialize(orm_rows), args.repeats)
+        column_rows, column_query_ms = _timed(column_query, args.repeats)
+        column_body, column_serialize_ms = _timed(
+            lambda: encode_movie_list(genre_index, column_rows), args.repeats
+        )
+
+        if json.loads(orm_body) != json.loads(column_body):
+            logger.error(f"Respostas diferentes para a página de {size} filmes")
+
+        orm_ms = orm_query_ms + orm_serialize_ms
+        column_ms = column_query_ms + column_serialize_ms
+        print(f"{size:>7} {orm_query_ms:>13.2f} {orm_serialize_ms:>12.2f} {orm_ms:>10.2f} "
+              f"{column_query_ms:>14.2f} {column_serialize_ms:>13.2f} {column_ms:>11.2f} "
+              f"{orm_ms / column_ms:>5.1f}x")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
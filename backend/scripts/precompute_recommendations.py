@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+"""
+Script para pré-calcular as recomendações de todos os usuários.
+
+Os usuários são pontuados em blocos (produtos esparsos matriz-matriz)
+distribuídos por um pool de processos, e os N melhores filmes de cada usuário
+são gravados na tabela user_recommendations. O endpoint /recommendations/user
+passa a ler essa lista e só recalcula para usuários cujas avaliações mudaram
+depois do lote.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Configurar o logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("precompute-recommendations")
+
+# Adicionar o diretório do projeto ao PATH para importações
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modelo usado pelos processos do pool (carregado uma vez por processo)
+_worker_model = None
+
+
+def _init_worker(version, model):
+    """Carrega o modelo no processo do pool, via mmap do artefato quando disponível."""
+    global _worker_model
+    from app.services.recommendation import _load_model
+
+    _worker_model = model if model is not None else _load_model(version)
+
+
+def _score_block(args):
+    """Pontua um bloco de usuários e retorna (user_ids, listas de filmes)."""
+    from app.services.recommendation import recommend_for_user_block
+
+    user_indices, user_ids, top_n = args
+    return user_ids, recommend_for_user_block(_worker_model, user_indices, top_n)
+
+
+def main():
+    """Função principal da pré-computação."""
+    from sqlalchemy import func, insert
+    from sqlalchemy.orm import Session
+    from app import models
+    from app.core.config import settings
+    from app.database.session import Base, engine
+    from app.services.recommendation import refresh_recommendation_model
+
+    parser = argparse.ArgumentParser(description='Pré-calcular recomendações de todos os usuários')
+    parser.add_argument('--top-n', type=int, default=settings.RECOMMENDER_PRECOMPUTE_TOP_N,
+                        help='Quantidade de filmes gravada por usuário')
+    parser.add_argument('--block-size', type=int, default=256,
+                        help='Usuários pontuados por bloco')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Processos no pool (padrão: número de CPUs)')
+
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = Session(engine)
+
+    try:
+        # Garantir um modelo atualizado (e gravado em disco para os processos do pool)
+        start = time.perf_counter()
+        model = refresh_recommendation_model(db)
+        logger.info(f"Modelo {model.version} pronto em {time.perf_counter() - start:.2f}s")
+
+        # Sem artefato em disco, o modelo é enviado diretamente para cada processo
+        shared_model = None if settings.RECOMMENDER_ARTIFACT_DIR else model
+
+        idx_to_user = np.zeros(len(model.user_to_idx), dtype=np.int64)
+        idx_to_user[list(model.user_to_idx.values())] = list(model.user_to_idx.keys())
+        blocks = [
+            (np.arange(start, min(start + args.block_size, len(idx_to_user))),
+             idx_to_user[start:start + args.block_size].tolist(),
+             args.top_n)
+            for start in range(0, len(idx_to_user), args.block_size)
+        ]
+
+        # Avaliações de cada usuário incorporadas ao modelo, para invalidar a lista
+        # quando o usuário remover ou acrescentar avaliações
+        rating_counts = dict(
+            db.query(models.Rating.user_id, func.count(models.Rating.id))
+            .filter(models.Rating.id <= model.last_rating_id)
+            .group_by(models.Rating.user_id)
+            .all()
+        )
+
+        start = time.perf_counter()
+        created_at = int(time.time())
+        rows = []
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(model.version, shared_model)) as pool:
+            for user_ids, movie_lists in pool.map(_score_block, blocks):
+                rows.extend(
+                    {
+                        "user_id": user_id,
+                        "movie_ids": movie_ids,
+                        "last_rating_id": model.last_rating_id,
+                        "rating_count": rating_counts.get(user_id, 0),
+                        "model_version": model.version,
+                        "created_at": created_at,
+                    }
+                    for user_id, movie_ids in zip(user_ids, movie_lists)
+                )
+        logger.info(f"{len(rows)} usuários pontuados em {time.perf_counter() - start:.2f}s "
+                    f"({len(blocks)} blocos, {args.workers} processos)")
+
+        # Substituir o lote anterior em uma única transação
+        db.query(models.UserRecommendation).delete()
+        if rows:
+            db.execute(insert(models.UserRecommendation), rows)
+        db.commit()
+        logger.info("Recomendações pré-calculadas gravadas com sucesso!")
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Erro durante a pré-computação: {e}")
+        sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -26,17 +26,15 @@ def main():
     parser.add_argument('--download', action='store_true',
                         help='Baixar dados se não forem encontrados localmente')
     parser.add_argument('--force', action='store_true',
-                        help='Forçar reimportação mesmo se o banco já contiver dados')
+                        help='Apagar os dados importados e recarregar tudo (sem isso, só o que é novo nos arquivos)')
 
     args = parser.parse_args()
 
     if args.force:
-        logger.warning("Reimportação forçada solicitada. Esta operação pode demorar.")
-        # Código extra para limpar o banco de dados pode ser adicionado aqui,
-        # mas isso pode ser implementado posteriormente se necessário
+        logger.warning("Reimportação forçada solicitada: avaliações, tags e dados derivados serão recarregados.")
 
     logger.info("Iniciando ETL...")
-    run_etl(data_dir=args.data_dir, download_if_missing=args.download)
+    run_etl(data_dir=args.data_dir, download_if_missing=args.download, force=args.force)
     logger.info("Processo ETL concluído!")
 
 if __name__ == "__main__":
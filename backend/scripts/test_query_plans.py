@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+"""
+Verifica com EXPLAIN QUERY PLAN que as consultas mais frequentes da API, das
+recomendações e do ETL usam os índices esperados (sem varrer a tabela nem
+ordenar em uma B-tree temporária), e que cada alvo de ON CONFLICT das
+gravações em lote do ETL tem um índice único com exatamente as suas colunas.
+
+Roda no banco de DATABASE_URL, depois das migrações (alembic upgrade head):
+
+    python scripts/test_query_plans.py
+
+Também é coletado pelo pytest, que confere os planos em um banco SQLite
+temporário criado por create_all e pelas migrações, com algumas linhas e
+ANALYZE, sem depender de DATABASE_URL.
+"""
+import os
+import sys
+import logging
+from typing import Dict, List, NamedTuple, Tuple
+
+# Configurar o logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("query-plan-test")
+
+# Adicionar o diretório do projeto ao PATH para importações
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    statement: object
+    # Índice que o plano deve usar e trechos que não podem aparecer nele
+    index: str
+    forbidden: Tuple[str, ...] = ("USE TEMP B-TREE",)
+
+
+def hot_queries() -> List[PlanCheck]:
+    """As consultas críticas, montadas como no código da aplicação."""
+    from sqlalchemy import func, select, text
+
+    from app import models
+    from app.services.movie_serialization import MOVIE_ROW_COLUMNS
+    from app.services.ranking import popular_movies_select
+
+    rating = models.Rating
+    return [
+        PlanCheck(
+            "ranking: agregados por filme (refresh_movie_rankings)",
+            select(rating.movie_id, func.avg(rating.rating), func.count(rating.id), func.sum(rating.rating))
+            .group_by(rating.movie_id),
+            "COVERING INDEX ix_ratings_movie_rating",
+        ),
+        PlanCheck(
+            "estatísticas: média das avaliações",
+            select(func.avg(rating.rating)),
+            "COVERING INDEX ix_ratings_movie_rating",
+        ),
+        PlanCheck(
+            "recomendações: avaliações do usuário após o lote",
+            select(rating.id).where(rating.user_id == 1, rating.id > 0).limit(1),
+            "ix_ratings_user_movie",
+        ),
+        PlanCheck(
+            "recomendações: contagem de avaliações do usuário",
+            select(func.count(rating.id)).where(rating.user_id == 1),
+            "COVERING INDEX ix_ratings_user_movie",
+        ),
+        PlanCheck(
+            "ETL: chaves (usuário, filme) já gravadas (_known_rating_keys)",
+            text("SELECT (user_id << 32) | movie_id FROM ratings"),
+            "COVERING INDEX ix_ratings_user_movie",
+        ),
+        PlanCheck(
+            "top-rated: página por pontuação",
+            popular_movies_select(min_ratings=5)
+            .with_only_columns(*MOVIE_ROW_COLUMNS, models.MovieRanking.bayesian_score, models.MovieRanking.movie_id)
+            .limit(20),
+            "ix_movie_rankings_score",
+        ),
+        PlanCheck(
+            "estatísticas: filmes por gênero",
+            text(
+                "SELECT g.name, COUNT(mg.movie_id) as movie_count FROM genres g "
+                "JOIN movie_genre mg ON g.id = mg.genre_id GROUP BY g.name ORDER BY movie_count DESC LIMIT 10"
+            ),
+            "COVERING INDEX ix_movie_genre_genre_movie",
+            forbidden=("SCAN mg",),
+        ),
+        PlanCheck(
+            "diagnóstico: gêneros sem filmes",
+            text(
+                "SELECT COUNT(g.id) FROM genres g WHERE NOT EXISTS "
+                "(SELECT 1 FROM movie_genre mg WHERE mg.genre_id = g.id)"
+            ),
+            "COVERING INDEX ix_movie_genre_genre_movie",
+            forbidden=("SCAN mg",),
+        ),
+        PlanCheck(
+            "busca: gêneros da página (selectinload)",
+            select(models.movie_genre.c.genre_id).where(models.movie_genre.c.movie_id.in_([1, 2, 3])),
+            "sqlite_autoindex_movie_genre_1",
+        ),
+        PlanCheck(
+            "tags de um filme (Movie.tags)",
+            select(models.Tag).where(models.Tag.movie_id == 1),
+            "ix_tags_movie_id",
+        ),
+        PlanCheck(
+            "favoritos do usuário",
+            select(models.Favorite.id).where(models.Favorite.user_id == 1).order_by(models.Favorite.id),
+            "INDEX",
+        ),
+    ]
+
+
+class ConflictTarget(NamedTuple):
+    name: str
+    table: str
+    columns: Tuple[str, ...]
+
+
+def conflict_targets() -> List[ConflictTarget]:
+    """Alvos de INSERT ... ON CONFLICT do ETL (app/utils/data_import.py e etl_state.py)."""
+    return [
+        ConflictTarget("ETL: filmes por movie_id (load_catalog)", "movies", ("movie_id",)),
+        ConflictTarget("ETL: gêneros por nome (load_catalog)", "genres", ("name",)),
+        ConflictTarget("ETL: associações filme-gênero (load_catalog)", "movie_genre", ("movie_id", "genre_id")),
+        ConflictTarget("ETL: tags por (usuário, filme, tag) (load_tags)", "tags", ("user_id", "movie_id", "tag")),
+        ConflictTarget("ETL: marcas por arquivo (FileWatermark.advance)", "etl_file_state", ("file_name",)),
+    ]
+
+
+def unique_indexes(connection, table: str) -> Dict[str, Tuple[str, ...]]:
+    """Índices únicos da tabela, inclusive os da chave primária, com suas colunas."""
+    indexes = {}
+    for _, name, unique, *_ in connection.exec_driver_sql(f"PRAGMA index_list({table})"):
+        if unique:
+            indexes[name] = tuple(row[2] for row in connection.exec_driver_sql(f"PRAGMA index_info({name})"))
+    return indexes
+
+
+def explain(connection, statement) -> List[str]:
+    """Linhas (detail) do EXPLAIN QUERY PLAN da consulta."""
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True})
+    result = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")
+    return [row[-1] for row in result]
+
+
+def check_query_plans(engine) -> List[str]:
+    """
+    Verifica todas as consultas e alvos de ON CONFLICT no banco do engine e
+    retorna a descrição dos que falharam.
+    """
+    failures = []
+    with engine.connect() as connection:
+        for check in hot_queries():
+            plan = explain(connection, check.statement)
+            logger.info(f"{check.name}: {' | '.join(plan)}")
+            problems = []
+            if not any(check.index in line for line in plan):
+                problems.append(f"não usa {check.index}")
+            problems += [f"contém {text}" for text in check.forbidden if any(text in line for line in plan)]
+            if problems:
+                failures.append(f"{check.name}: {', '.join(problems)} ({' | '.join(plan)})")
+
+        for target in conflict_targets():
+            indexes = unique_indexes(connection, target.table)
+            matching = [name for name, columns in indexes.items() if set(columns) == set(target.columns)]
+            logger.info(f"{target.name}: {', '.join(matching) or 'nenhum índice único'}")
+            if not matching:
+                failures.append(f"{target.name}: sem índice único em {target.table} ({', '.join(target.columns)})")
+    return failures
+
+
+def seed_database(engine) -> None:
+    """Algumas linhas em cada tabela consultada e ANALYZE, para o planejador ter estatísticas."""
+    from sqlalchemy import insert, text
+
+    from app import models
+
+    users, movies, genres = range(1, 21), range(1, 51), range(1, 6)
+    with engine.begin() as connection:
+        connection.execute(insert(models.User), [
+            {"id": user_id, "email": f"user{user_id}@example.com", "username": f"user{user_id}",
+             "hashed_password": "x", "is_active": True}
+            for user_id in users
+        ])
+        connection.execute(insert(models.Movie), [
+            {"id": movie_id, "movie_id": movie_id, "title": f"Filme {movie_id}"} for movie_id in movies
+        ])
+        connection.execute(insert(models.Genre), [{"id": genre_id, "name": f"Gênero {genre_id}"} for genre_id in genres])
+        connection.execute(insert(models.movie_genre), [
+            {"movie_id": movie_id, "genre_id": movie_id % len(genres) + 1} for movie_id in movies
+        ])
+        connection.execute(insert(models.Rating), [
+            {"user_id": user_id, "movie_id": movie_id, "rating": (user_id + movie_id) % 5 + 1.0, "timestamp": 0}
+            for user_id in users for movie_id in movies if (user_id + movie_id) % 3 == 0
+        ])
+        connection.execute(insert(models.Tag), [
+            {"user_id": user_id, "movie_id": movie_id, "tag": "funny", "timestamp": 0}
+            for user_id in users for movie_id in movies if (user_id * movie_id) % 7 == 0
+        ])
+        connection.execute(insert(models.Favorite), [
+            {"user_id": user_id, "movie_id": user_id * 2} for user_id in users
+        ])
+        connection.execute(insert(models.MovieRanking), [
+            {"movie_id": movie_id, "rating_mean": 3.0, "rating_count": movie_id % 10,
+             "bayesian_score": 3.0 + movie_id / 100}
+            for movie_id in movies
+        ])
+        connection.execute(text("ANALYZE"))
+
+
+def test_query_plans(tmp_path):
+    from sqlalchemy import create_engine
+
+    import app.models  # noqa: F401 - registra os modelos em Base.metadata
+    from app.database.migrations import run_migrations
+    from app.database.session import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'query_plans.db'}")
+    try:
+        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
+        seed_database(engine)
+        failures = check_query_plans(engine)
+    finally:
+        engine.dispose()
+    assert not failures, "\n".join(failures)
+
+
+if __name__ == "__main__":
+    from app.database.session import engine
+
+    failures = check_query_plans(engine)
+    for failure in failures:
+        logger.error(failure)
+    if failures:
+        sys.exit(1)
+    logger.info("Todas as consultas usam os índices esperados.")
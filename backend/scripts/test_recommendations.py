@@ -19,7 +19,7 @@ def test_similar_movies(movie_id=1, limit=5):
     """Testar a função get_similar_movies diretamente."""
     from sqlalchemy.orm import Session
     from app.database.session import engine
-    from app.services.recommendation import get_similar_movies
+    from app.services.recommendation import get_similar_movies, refresh_recommendation_model
 
     # Criar sessão do banco de dados
     db = Session(engine)
@@ -36,6 +36,9 @@ def test_similar_movies(movie_id=1, limit=5):
         logger.info(f"Encontrado filme: {movie.title} (ID={movie.id}, movie_id={movie.movie_id})")
         logger.info(f"Gêneros: {', '.join(g.name for g in movie.genres)}")
 
+        # Construir o modelo antes da consulta (normalmente feito pelo atualizador em segundo plano)
+        refresh_recommendation_model(db)
+
         # Chamar diretamente a função de recomendação com debug detalhado
         logger.info(f"Chamando get_similar_movies para movie_id={movie_id}...")
         similar_movie_ids = get_similar_movies(db, movie_id, limit)